@@ -1,7 +1,6 @@
 # run.py (СЕРВЕРНАЯ ВЕРСИЯ)
 import sys
 from pathlib import Path
-import asyncio
 import threading
 import logging
 
@@ -9,40 +8,29 @@ import logging
 SRC_DIR = Path(__file__).resolve().parent / 'src'
 sys.path.insert(0, str(SRC_DIR))
 
-# 2. Импортируем наши компоненты уже после настройки пути
-from bots.client_bot import create_client_bot_app
-from bots.admin_bot import create_admin_bot_app
-from database import init_db
+# 2. Импортируем наши компоненты уже после настройки пути.
+# Каждый импорт замеряется: разбивка печатается после старта ботов.
+# Flask и services.imgbb (requests) сюда не попадают — они грузятся лениво.
+from utils.startup import startup
 
-# 3. Настраиваем логирование
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
+with startup.phase("import database (sqlalchemy)"):
+    from database import init_db
+with startup.phase("import bots.client_bot (telegram)"):
+    from bots.client_bot import create_client_bot_app
+with startup.phase("import bots.admin_bot"):
+    from bots.admin_bot import create_admin_bot_app
+with startup.phase("import services"):
+    from services.reservation_sweeper import start_sweeper_thread
+    from services.catalog_snapshot import publish_catalog
+    from services.maintenance import start_maintenance_thread
+    from services import watchdog
 
+# 3. Настраиваем логирование: запись в stderr идет в отдельном потоке через очередь
+from utils.logging_setup import setup_logging
+from utils.tracing import setup_tracing
 
-def run_bot(bot_creator_func, bot_name):
-    """
-    Универсальная функция для запуска бота в новом цикле событий,
-    адаптированная для сервера.
-    """
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-
-    try:
-        logging.info(f"Запуск {bot_name}...")
-        app = bot_creator_func()
-
-        # Запускаем run_polling БЕЗ обработки сигналов,
-        # чтобы избежать ошибки 'set_wakeup_fd'
-        loop.run_until_complete(
-            app.run_polling(stop_signals=None)
-        )
-
-    except Exception as e:
-        logging.error(f"Критическая ошибка в потоке {bot_name}: {e}", exc_info=True)
-    finally:
-        loop.close()
+setup_logging()
+setup_tracing()
 
 
 def main():
@@ -50,32 +38,29 @@ def main():
     Главная функция, которая запускает ТОЛЬКО ботов.
     Веб-приложение запускается отдельно через WSGI.
     """
-    init_db()
+    with startup.phase("init_db"):
+        init_db()
     logging.info("База данных инициализирована.")
 
-    # Создаем и запускаем потоки для ботов
-    client_bot_thread = threading.Thread(
-        target=run_bot,
-        args=(create_client_bot_app, "клиентского бота"),
-        name="ClientBotThread"
-    )
-    admin_bot_thread = threading.Thread(
-        target=run_bot,
-        args=(create_admin_bot_app, "административного бота"),
-        name="AdminBotThread"
-    )
+    # Публикуем свежий снимок каталога для воркеров веб-приложения
+    with startup.phase("publish_catalog"):
+        publish_catalog()
 
-    client_bot_thread.daemon = True
-    admin_bot_thread.daemon = True
+    # Создаем и запускаем потоки для ботов; за ними следит watchdog
+    watchdog.register_bot("клиентского бота", create_client_bot_app, "ClientBotThread")
+    watchdog.register_bot("административного бота", create_admin_bot_app, "AdminBotThread")
+    watchdog.start_bots()
+    watchdog.start_health_server()
 
-    client_bot_thread.start()
-    admin_bot_thread.start()
+    # Фоновая очистка истекших резервов корзин и плановое обслуживание БД
+    start_sweeper_thread()
+    start_maintenance_thread()
 
     logging.info("Боты запущены в фоновых потоках. Основной процесс продолжает работу.")
+    startup.report()
 
-    # Этот цикл просто держит основной процесс живым
-    client_bot_thread.join()
-    admin_bot_thread.join()
+    # Основной поток держит процесс живым и перезапускает упавших ботов
+    watchdog.supervise(threading.Event())
 
 
 if __name__ == "__main__":
@@ -1,14 +1,23 @@
 # src/bots/admin_bot.py
+import asyncio
+import html
 import logging
+from datetime import datetime, timedelta
 from functools import wraps
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (Application, CommandHandler, CallbackQueryHandler, MessageHandler,
-                          filters, ContextTypes, ConversationHandler)
+                          TypeHandler, filters, ContextTypes, ConversationHandler)
 
 import config
 from database import SessionLocal, queries
-from services import imgbb
+from database.models import ORDER_STATUSES, ORDER_STATUS_NEXT
+from services import backup, catalog_snapshot
+from bots.persistence import SQLitePersistence
+from services.notifier import CustomerNotifier
+from utils.logging_setup import bind_update_context
+from bots.instrumentation import PollingRequest, TracedApplication, TracedRequest
 from utils.helpers import create_admin_pagination_keyboard
+from utils import profiler, rate_limit
 
 # ==================== ИСПРАВЛЕНИЕ ЗДЕСЬ ====================
 logger = logging.getLogger(__name__)
@@ -16,6 +25,12 @@ logger = logging.getLogger(__name__)
 
 (NAME, BRAND, CATEGORY, DESCRIPTION, COMPOSITION, PHOTO, VARIANTS, CONFIRM) = range(8)
 
+# Периоды фильтра входящих заказов: код в callback_data -> (подпись, глубина)
+ORDER_PERIODS = {'d': ("Сутки", timedelta(days=1)), 'w': ("7 дней", timedelta(days=7)), 'a': ("Все", None)}
+
+# Уведомления покупателям о смене статуса; создается вместе с приложением админ-бота
+customer_notifier: CustomerNotifier | None = None
+
 
 def restricted(func):
     @wraps(func)
@@ -34,6 +49,7 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     keyboard = [
         [InlineKeyboardButton("➕ Добавить товар", callback_data='add_product')],
         [InlineKeyboardButton("📝 Список товаров", callback_data='list_products_0')],
+        [InlineKeyboardButton("📬 Заказы", callback_data='orders_0_a_0')],
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
 
@@ -90,6 +106,9 @@ async def get_composition(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
 
 async def get_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    # Ленивый импорт: requests нужен только при загрузке фото, не на старте бота
+    from services import imgbb
+
     photo_file = await update.message.photo[-1].get_file()
     photo_bytes = await photo_file.download_as_bytearray()
 
@@ -171,6 +190,7 @@ async def save_product_confirmed(update: Update, context: ContextTypes.DEFAULT_T
         await query.edit_message_caption(
             caption=f"🎉 Товар '{new_product.name}' успешно добавлен с ID {new_product.id}!", reply_markup=None)
         logger.info(f"Админ {update.effective_user.id} добавил товар {new_product.name}")
+        catalog_snapshot.request_publish()
     except Exception as e:
         logger.error(f"Ошибка сохранения товара в БД: {e}", exc_info=True)
         await query.edit_message_caption(caption="Произошла ошибка при сохранении товара.", reply_markup=None)
@@ -283,6 +303,7 @@ async def delete_do(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         if queries.delete_product(db, product_id):
             await query.answer("Товар удален!")
             logger.info(f"Админ {update.effective_user.id} удалил товар {product_id}")
+            catalog_snapshot.request_publish()
             await query.message.delete()
             query.data = 'list_products_0'
             await list_products(update, context)
@@ -292,8 +313,209 @@ async def delete_do(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         db.close()
 
 
+def _order_filter_from_callback(data: str):
+    """Разбирает '<prefix>_<статус>_<период>_<хвост>' из callback_data входящих заказов."""
+    _, status_idx, period, tail = data.split('_')
+    status = ORDER_STATUSES[int(status_idx)]
+    depth = ORDER_PERIODS[period][1]
+    since = datetime.utcnow() - depth if depth else None
+    return int(status_idx), status, period, since, tail
+
+
+@restricted
+async def orders_inbox(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    query = update.callback_query
+    await query.answer()
+    await _render_orders_inbox(query, context, query.data)
+
+
+async def _render_orders_inbox(query, context: ContextTypes.DEFAULT_TYPE, data: str) -> None:
+    status_idx, status, period, since, cursor = _order_filter_from_callback(data)
+    cursor_id = int(cursor) or None
+
+    db = SessionLocal()
+    try:
+        orders, has_more = queries.get_orders_page(db, status, since, cursor_id, config.ORDERS_PER_PAGE)
+        total = queries.count_orders(db, status, since)
+    finally:
+        db.close()
+
+    # Запоминаем заказы страницы для массовой смены статуса «на этой странице»
+    context.user_data['inbox_page_ids'] = [o.id for o in orders]
+
+    lines = [
+        f"№{o.id} · {o.created_at.strftime('%d.%m %H:%M')} · {o.total_amount:.0f} ₽ · "
+        # Имя покупателя — произвольный текст: без экранирования "<" или "&" ломают HTML-разметку
+        f"{html.escape('@' + o.user.username if o.user.username else o.user.full_name)}"
+        for o in orders
+    ]
+    text = (f"<b>📬 Заказы: {html.escape(status)}</b> ({ORDER_PERIODS[period][0].lower()}), всего {total}\n\n"
+            + ("\n".join(lines) if lines else "Заказов нет."))
+
+    keyboard = [
+        [InlineKeyboardButton(f"• {s}" if i == status_idx else s, callback_data=f'orders_{i}_{period}_0')
+         for i, s in enumerate(ORDER_STATUSES)],
+        [InlineKeyboardButton(f"• {label}" if code == period else label, callback_data=f'orders_{status_idx}_{code}_0')
+         for code, (label, _) in ORDER_PERIODS.items()],
+    ]
+    nav_buttons = []
+    if cursor_id:
+        nav_buttons.append(InlineKeyboardButton("⏮ В начало", callback_data=f'orders_{status_idx}_{period}_0'))
+    if has_more:
+        nav_buttons.append(InlineKeyboardButton("Далее ➡️", callback_data=f'orders_{status_idx}_{period}_{orders[-1].id}'))
+    if nav_buttons:
+        keyboard.append(nav_buttons)
+
+    next_status = ORDER_STATUS_NEXT.get(status)
+    if next_status and orders:
+        keyboard.append([InlineKeyboardButton(f"▶️ Страницу → {next_status}",
+                                              callback_data=f'ordbulk_{status_idx}_{period}_pg')])
+        keyboard.append([InlineKeyboardButton(f"⏩ Все ({total}) → {next_status}",
+                                              callback_data=f'ordbulk_{status_idx}_{period}_all')])
+    keyboard.append([InlineKeyboardButton("🏠 В главное меню", callback_data='main_menu')])
+
+    await query.edit_message_text(text, parse_mode='HTML', reply_markup=InlineKeyboardMarkup(keyboard))
+
+
+@restricted
+async def orders_bulk_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    query = update.callback_query
+    await query.answer()
+    status_idx, status, period, since, scope = _order_filter_from_callback(query.data)
+
+    if scope == 'pg':
+        count = len(context.user_data.get('inbox_page_ids', []))
+    else:
+        db = SessionLocal()
+        try:
+            count = queries.count_orders(db, status, since)
+        finally:
+            db.close()
+
+    keyboard = [
+        [InlineKeyboardButton("✅ Да, перевести", callback_data=f'ordbulkdo_{status_idx}_{period}_{scope}')],
+        [InlineKeyboardButton("❌ Нет, отмена", callback_data=f'orders_{status_idx}_{period}_0')]
+    ]
+    await query.edit_message_text(
+        f"Перевести {count} заказ(ов) из «{status}» в «{ORDER_STATUS_NEXT[status]}»? "
+        "Покупатели получат уведомление.",
+        reply_markup=InlineKeyboardMarkup(keyboard))
+
+
+@restricted
+async def orders_bulk_do(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    query = update.callback_query
+    status_idx, status, period, since, scope = _order_filter_from_callback(query.data)
+    next_status = ORDER_STATUS_NEXT[status]
+    order_ids = context.user_data.get('inbox_page_ids', []) if scope == 'pg' else None
+
+    db = SessionLocal()
+    try:
+        recipients = queries.bulk_update_order_status(db, status, next_status, since, order_ids)
+    finally:
+        db.close()
+
+    for order_id, telegram_id in recipients:
+        customer_notifier.enqueue(telegram_id, f"📦 Статус вашего заказа №{order_id} изменен: <b>{next_status}</b>")
+
+    logger.info("Админ %s перевел %s заказ(ов) из «%s» в «%s»",
+                update.effective_user.id, len(recipients), status, next_status)
+    await query.answer(f"Обновлено заказов: {len(recipients)}")
+    await _render_orders_inbox(query, context, f'orders_{status_idx}_{period}_0')
+
+
+@restricted
+async def backup_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    msg = await update.message.reply_text("Создаю бэкап базы данных...")
+    loop = asyncio.get_running_loop()
+    last_reported = {'percent': 0}
+
+    async def report(percent: int):
+        try:
+            await msg.edit_text(f"Создаю бэкап базы данных... {percent}%")
+        except Exception:
+            # Сообщение о прогрессе не критично (например, Telegram не дал отредактировать)
+            pass
+
+    def progress(copied: int, total: int):
+        # Вызывается из потока бэкапа: в цикл событий передаем только каждые 10%
+        percent = copied * 100 // max(total, 1)
+        if percent - last_reported['percent'] >= 10:
+            last_reported['percent'] = percent
+            asyncio.run_coroutine_threadsafe(report(percent), loop)
+
+    try:
+        archive = await asyncio.to_thread(backup.create_backup, progress)
+        ok, details = await asyncio.to_thread(backup.verify_backup, archive)
+    except Exception as e:
+        logger.error("Ошибка создания бэкапа: %s", e, exc_info=True)
+        await msg.edit_text("Не удалось создать бэкап. Подробности в логах.")
+        return
+
+    size_mb = archive.stat().st_size / 1024 / 1024
+    status = "✅ проверка пройдена" if ok else "⚠️ проверка НЕ пройдена"
+    await msg.edit_text(f"Бэкап готов: {archive.name} ({size_mb:.1f} МБ)\n{status}: {details}")
+    logger.info("Админ %s создал бэкап %s", update.effective_user.id, archive.name)
+
+
+@restricted
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    try:
+        seconds = float(context.args[0]) if context.args else 10.0
+    except ValueError:
+        await update.message.reply_text("Использование: /profile <секунд>")
+        return
+    seconds = min(max(seconds, 1.0), config.PROFILE_MAX_SECONDS)
+
+    await update.message.reply_text(f"Профилирую все потоки {seconds:.0f} сек...")
+    try:
+        # Сэмплирование идет в отдельном потоке: цикл событий бота не блокируется
+        profile = await asyncio.to_thread(profiler.sample, seconds, config.PROFILE_INTERVAL)
+    except RuntimeError as e:
+        await update.message.reply_text(str(e))
+        return
+
+    busy, top = profile.top(config.PROFILE_TOP_N)
+    table = "\n".join(f"{own:>5} {total:>5}  {name}" for name, own, total in top) or "нет активных выборок"
+    summary = (f"<b>Профиль за {profile.seconds:.1f} сек:</b> {profile.samples} выборок, "
+               f"стеков вне ожидания: {busy}\n"
+               f"<pre>своих  всего  функция\n{html.escape(table)}</pre>")
+    filename = f"profile-{datetime.now().strftime('%Y%m%d-%H%M%S')}.collapsed"
+    await update.message.reply_document(document=profile.collapsed().encode('utf-8'), filename=filename,
+                                        caption="Стеки в collapsed-формате (flamegraph.pl, speedscope)")
+    await update.message.reply_html(summary)
+    logger.info("Админ %s снял профиль за %.1f сек.", update.effective_user.id, profile.seconds)
+
+
+@restricted
+async def rate_limit_stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    stats = rate_limit.get_stats()
+    # Счетчики web:* ведет процесс веб-приложения (WSGI), они видны в его /healthz
+    hint = "\n\nЛимиты веб-приложения (web:*) — в его /healthz."
+    if not stats:
+        await update.message.reply_text("Лимиты ботов еще не срабатывали." + hint)
+        return
+
+    lines = [f"<b>{name}</b>: пропущено {s['allowed']}, отброшено {s['throttled']}" for name, s in stats.items()]
+    await update.message.reply_html("<b>Ограничение частоты запросов:</b>\n" + "\n".join(lines) + hint)
+
+
 def create_admin_bot_app():
-    application = Application.builder().token(config.ADMIN_BOT_TOKEN).build()
+    # Незавершенное добавление товара переживает перезапуск: состояние хранится в SQLite
+    global customer_notifier
+    customer_notifier = CustomerNotifier(config.TOKEN, config.NOTIFY_RATE_PER_SECOND)
+
+    async def post_init(app: Application) -> None:
+        await customer_notifier.start()
+
+    async def post_shutdown(app: Application) -> None:
+        await customer_notifier.stop()
+
+    persistence = SQLitePersistence('admin', update_interval=config.PERSISTENCE_UPDATE_INTERVAL)
+    application = (Application.builder().token(config.ADMIN_BOT_TOKEN).persistence(persistence)
+                   .application_class(TracedApplication).request(TracedRequest(connection_pool_size=256))
+                   .get_updates_request(PollingRequest())
+                   .post_init(post_init).post_shutdown(post_shutdown).build())
 
     conv_handler = ConversationHandler(
         entry_points=[CallbackQueryHandler(add_product_start, pattern='^add_product$')],
@@ -312,14 +534,23 @@ def create_admin_bot_app():
             ],
         },
         fallbacks=[CommandHandler('cancel', cancel), CallbackQueryHandler(cancel, pattern='^main_menu$')],
+        name='add_product',
+        persistent=True,
     )
 
+    application.add_handler(TypeHandler(Update, bind_update_context), group=-1)
     application.add_handler(CommandHandler("start", start_command))
+    application.add_handler(CommandHandler("ratelimits", rate_limit_stats))
+    application.add_handler(CommandHandler("backup", backup_command, block=False))
+    application.add_handler(CommandHandler("profile", profile_command, block=False))
     application.add_handler(conv_handler)
     application.add_handler(CallbackQueryHandler(list_products, pattern='^list_products_'))
     application.add_handler(CallbackQueryHandler(view_product, pattern='^view_product_'))
     application.add_handler(CallbackQueryHandler(delete_confirm, pattern='^delete_confirm_'))
     application.add_handler(CallbackQueryHandler(delete_do, pattern='^delete_do_'))
+    application.add_handler(CallbackQueryHandler(orders_inbox, pattern='^orders_'))
+    application.add_handler(CallbackQueryHandler(orders_bulk_confirm, pattern='^ordbulk_'))
+    application.add_handler(CallbackQueryHandler(orders_bulk_do, pattern='^ordbulkdo_'))
     application.add_handler(CallbackQueryHandler(start_command, pattern='^main_menu$'))
     application.add_handler(CallbackQueryHandler(lambda u, c: u.callback_query.answer(), pattern='^noop$'))
 
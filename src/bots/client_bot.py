@@ -1,28 +1,38 @@
 # src/bots/client_bot.py
 import json
 import logging
+from urllib.parse import urlencode
+
 from telegram import Update, ReplyKeyboardMarkup, KeyboardButton, WebAppInfo
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
+from telegram.ext import Application, CommandHandler, MessageHandler, TypeHandler, filters, ContextTypes
 
 import config  # <--- Вот эта строка
 from database import SessionLocal
 from database import queries
 from services import order_processor
+from utils.logging_setup import bind_update_context
+from bots.instrumentation import PollingRequest, TracedApplication, TracedRequest
 from utils.helpers import format_order_message
+from utils.rate_limit import rate_limited
+from utils import launch_token
 
 logger = logging.getLogger(__name__)
 
 
+@rate_limited('bot:start')
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     db = SessionLocal()
     try:
         user = queries.get_or_create_user(db, update.effective_user)
-        logger.info(f"Пользователь {user.telegram_id} запустил бота.")
+        logger.info("Пользователь %s запустил бота.", user.telegram_id)
     finally:
         db.close()
 
+    # Кнопка обычной клавиатуры не передает магазину initData — подписываем покупателя в ссылке
+    separator = '&' if '?' in config.WEBAPP_URL else '?'
+    shop_url = config.WEBAPP_URL + separator + urlencode({'token': launch_token.sign(update.effective_user.id)})
     keyboard = [
-        [KeyboardButton("🛍️ Открыть магазин", web_app=WebAppInfo(url=config.WEBAPP_URL))],
+        [KeyboardButton("🛍️ Открыть магазин", web_app=WebAppInfo(url=shop_url))],
         [KeyboardButton("📦 Мои заказы")]
     ]
     text = (
@@ -35,6 +45,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     await update.message.reply_text(text, reply_markup=ReplyKeyboardMarkup(keyboard, resize_keyboard=True))
 
 
+@rate_limited('bot:my_orders')
 async def my_orders(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     db = SessionLocal()
     try:
@@ -57,13 +68,14 @@ async def my_orders(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         db.close()
 
 
+@rate_limited('bot:web_app_data', notify=True)
 async def web_app_data(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     data = json.loads(update.effective_message.web_app_data.data)
     if data.get('event') == 'newOrder':
         order_data = data.get('data', {})
         items = order_data.get('items', [])
         if not items:
-            logger.warning(f"Получен пустой заказ от {update.effective_user.id}")
+            logger.warning("Получен пустой заказ от %s", update.effective_user.id)
             return
 
         db = SessionLocal()
@@ -78,7 +90,7 @@ async def web_app_data(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
                                                  parse_mode='HTML')
                 else:
                     await context.bot.send_message(chat_id=user.telegram_id, text=caption, parse_mode='HTML')
-                logger.info(f"Создан заказ #{new_order.id} для пользователя {user.telegram_id}")
+                logger.info("Создан заказ #%s для пользователя %s", new_order.id, user.telegram_id)
             else:
                 await context.bot.send_message(
                     chat_id=user.telegram_id,
@@ -86,14 +98,17 @@ async def web_app_data(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
                 )
 
         except Exception as e:
-            logger.error(f"Критическая ошибка обработки web_app_data: {e}", exc_info=True)
+            logger.error("Критическая ошибка обработки web_app_data: %s", e, exc_info=True)
             await update.message.reply_text("Произошла внутренняя ошибка при оформлении заказа. Попробуйте позже.")
         finally:
             db.close()
 
 
 def create_client_bot_app():
-    application = Application.builder().token(config.TOKEN).build()
+    application = (Application.builder().token(config.TOKEN)
+                   .application_class(TracedApplication).request(TracedRequest(connection_pool_size=256))
+                   .get_updates_request(PollingRequest()).build())
+    application.add_handler(TypeHandler(Update, bind_update_context), group=-1)
     application.add_handler(CommandHandler("start", start))
     application.add_handler(MessageHandler(filters.TEXT & filters.Regex('^📦 Мои заказы$'), my_orders))
     application.add_handler(MessageHandler(filters.StatusUpdate.WEB_APP_DATA, web_app_data))
@@ -0,0 +1,38 @@
+# src/bots/instrumentation.py
+from telegram.ext import Application
+from telegram.request import HTTPXRequest
+
+from services import watchdog
+from utils import tracing
+
+
+class TracedApplication(Application):
+    """Application, в котором обработка каждого апдейта — отдельная трасса."""
+
+    async def process_update(self, update: object) -> None:
+        update_id = getattr(update, 'update_id', None)
+        with tracing.trace('telegram.update', update_id=update_id):
+            await super().process_update(update)
+        watchdog.record_update()
+
+
+class TracedRequest(HTTPXRequest):
+    """
+    HTTPXRequest, который оборачивает каждый вызов Bot API в span (только внутри трассы).
+    Создавать с connection_pool_size=256, как это делает ApplicationBuilder по умолчанию:
+    у самого HTTPXRequest пул на одно соединение.
+    """
+
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        # url вида https://api.telegram.org/bot<token>/sendPhoto — в span пишем только метод
+        with tracing.span('telegram.api', method=url.rsplit('/', 1)[-1]):
+            return await super().do_request(url, method, *args, **kwargs)
+
+
+class PollingRequest(HTTPXRequest):
+    """HTTPXRequest для getUpdates: каждый успешный ответ — отметка живого polling для watchdog."""
+
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        result = await super().do_request(url, method, *args, **kwargs)
+        watchdog.record_poll()
+        return result
@@ -0,0 +1,186 @@
+# src/bots/persistence.py
+import asyncio
+import json
+import logging
+import pickle
+import threading
+
+from sqlalchemy import and_, bindparam, delete, select
+from sqlalchemy.dialects.sqlite import insert
+from telegram.ext import BasePersistence, PersistenceInput
+
+from database import engine
+from database.models import PersistenceEntry
+
+logger = logging.getLogger(__name__)
+
+USER_DATA = 'user_data'
+CHAT_DATA = 'chat_data'
+BOT_DATA = 'bot_data'
+CONVERSATION = 'conversation'
+
+
+class SQLitePersistence(BasePersistence):
+    """
+    Хранит состояние бота построчно в таблице bot_persistence нашей SQLite-базы.
+
+    Запись отложенная: update_* только сравнивают новые данные с последним
+    сохраненным снимком и кладут изменившиеся ключи в очередь, а сами INSERT/DELETE
+    выполняются пачкой в отдельном потоке. Поэтому обработка апдейтов
+    никогда не ждет диска.
+    """
+
+    def __init__(self, bot_name: str, update_interval: float = 60):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=True, chat_data=True, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.bot_name = bot_name
+        # Последние записанные (или поставленные в очередь) байты по ключу строки
+        self._snapshots: dict[tuple[str, str, str], bytes] = {}
+        # Очередь изменений: байты для upsert или None для удаления
+        self._pending: dict[tuple[str, str, str], bytes | None] = {}
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._writer_running = False
+
+    # --- Чтение ---
+    def _load(self, kind: str, name: str = '') -> dict[str, bytes]:
+        stmt = select(PersistenceEntry.key, PersistenceEntry.value).where(
+            PersistenceEntry.bot_name == self.bot_name,
+            PersistenceEntry.kind == kind,
+            PersistenceEntry.name == name,
+        )
+        with engine.connect() as conn:
+            rows = {key: value for key, value in conn.execute(stmt)}
+        for key, value in rows.items():
+            self._snapshots[(kind, name, key)] = value
+        return rows
+
+    async def get_user_data(self) -> dict:
+        rows = await asyncio.to_thread(self._load, USER_DATA)
+        return {int(key): pickle.loads(value) for key, value in rows.items()}
+
+    async def get_chat_data(self) -> dict:
+        rows = await asyncio.to_thread(self._load, CHAT_DATA)
+        return {int(key): pickle.loads(value) for key, value in rows.items()}
+
+    async def get_bot_data(self) -> dict:
+        rows = await asyncio.to_thread(self._load, BOT_DATA)
+        return pickle.loads(rows['']) if '' in rows else {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name: str) -> dict:
+        rows = await asyncio.to_thread(self._load, CONVERSATION, name)
+        return {tuple(json.loads(key)): pickle.loads(value) for key, value in rows.items()}
+
+    # --- Запись ---
+    def _enqueue(self, kind: str, key: str, data, name: str = '') -> None:
+        row_key = (kind, name, key)
+        value = None if data is None else pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        # Грязной считается только строка, чьи байты изменились с прошлой записи
+        if value is not None and self._snapshots.get(row_key) == value:
+            return
+        if value is None:
+            self._snapshots.pop(row_key, None)
+        else:
+            self._snapshots[row_key] = value
+
+        with self._pending_lock:
+            self._pending[row_key] = value
+            if self._writer_running:
+                return
+            self._writer_running = True
+        threading.Thread(target=self._drain, name=f"PersistenceWriter-{self.bot_name}", daemon=True).start()
+
+    def _drain(self) -> None:
+        """Пишет очередь пачками, пока она не опустеет."""
+        with self._write_lock:
+            while True:
+                with self._pending_lock:
+                    batch, self._pending = self._pending, {}
+                    if not batch:
+                        self._writer_running = False
+                        return
+                try:
+                    self._write_batch(batch)
+                except Exception as e:
+                    logger.error("Ошибка записи состояния бота %s: %s", self.bot_name, e, exc_info=True)
+                    with self._pending_lock:
+                        # Возвращаем неудачную пачку, не затирая более свежие изменения
+                        for row_key, value in batch.items():
+                            self._pending.setdefault(row_key, value)
+                        self._writer_running = False
+                    return
+
+    def _write_batch(self, batch: dict) -> None:
+        upserts = [
+            {'bot_name': self.bot_name, 'kind': kind, 'name': name, 'key': key, 'value': value}
+            for (kind, name, key), value in batch.items() if value is not None
+        ]
+        deletes = [
+            {'b_kind': kind, 'b_name': name, 'b_key': key}
+            for (kind, name, key), value in batch.items() if value is None
+        ]
+
+        with engine.begin() as conn:
+            if upserts:
+                stmt = insert(PersistenceEntry)
+                conn.execute(
+                    stmt.on_conflict_do_update(
+                        index_elements=['bot_name', 'kind', 'name', 'key'],
+                        set_={'value': stmt.excluded.value},
+                    ),
+                    upserts,
+                )
+            if deletes:
+                conn.execute(
+                    delete(PersistenceEntry).where(and_(
+                        PersistenceEntry.bot_name == self.bot_name,
+                        PersistenceEntry.kind == bindparam('b_kind'),
+                        PersistenceEntry.name == bindparam('b_name'),
+                        PersistenceEntry.key == bindparam('b_key'),
+                    )),
+                    deletes,
+                )
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        self._enqueue(USER_DATA, str(user_id), data)
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        self._enqueue(CHAT_DATA, str(chat_id), data)
+
+    async def update_bot_data(self, data: dict) -> None:
+        self._enqueue(BOT_DATA, '', data)
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def update_conversation(self, name: str, key: tuple, new_state: object | None) -> None:
+        self._enqueue(CONVERSATION, json.dumps(list(key)), new_state, name=name)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._enqueue(USER_DATA, str(user_id), None)
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        self._enqueue(CHAT_DATA, str(chat_id), None)
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
+
+    async def flush(self) -> None:
+        """Вызывается при остановке приложения: дописываем очередь синхронно."""
+        await asyncio.to_thread(self._drain_on_shutdown)
+
+    def _drain_on_shutdown(self) -> None:
+        with self._pending_lock:
+            self._writer_running = True
+        self._drain()
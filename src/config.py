@@ -34,6 +34,143 @@ except (AttributeError, ValueError) as e:
 # Формируем путь к файлу БД относительно корня проекта
 DATABASE_URL = f"sqlite:///{BASE_DIR / 'vibesresell.db'}"
 
+# --- Настройки веб-приложения ---
+# Ответы API меньше этого размера (в байтах) не сжимаются
+JSON_COMPRESS_MIN_SIZE = int(os.getenv('JSON_COMPRESS_MIN_SIZE', '1024'))
+# Списки длиннее этого порога отдаются потоком (chunked), порциями по JSON_STREAM_CHUNK_ITEMS
+JSON_STREAM_MIN_ITEMS = int(os.getenv('JSON_STREAM_MIN_ITEMS', '200'))
+JSON_STREAM_CHUNK_ITEMS = int(os.getenv('JSON_STREAM_CHUNK_ITEMS', '50'))
+# Максимум товаров в одном запросе /api/products/details
+PRODUCT_DETAILS_BATCH_LIMIT = int(os.getenv('PRODUCT_DETAILS_BATCH_LIMIT', '50'))
+# Снимок каталога, который разделяют все воркеры веб-приложения через mmap
+CATALOG_SNAPSHOT_PATH = Path(os.getenv('CATALOG_SNAPSHOT_PATH', BASE_DIR / 'catalog.snapshot'))
+# Сколько доверенных прокси стоит перед веб-приложением (nginx = 1): IP клиента берется
+# из X-Forwarded-For. 0 — заголовок игнорируется (приложение смотрит в сеть напрямую)
+WEBAPP_PROXY_HOPS = int(os.getenv('WEBAPP_PROXY_HOPS', '0'))
+# Тот же каталог, упорядоченный по популярности (/api/products?sort=popular)
+CATALOG_POPULAR_SNAPSHOT_PATH = Path(os.getenv('CATALOG_POPULAR_SNAPSHOT_PATH', BASE_DIR / 'catalog-popular.snapshot'))
+# Задержка (в секундах), за которую серия изменений склеивается в одну публикацию снимка
+CATALOG_PUBLISH_DELAY = float(os.getenv('CATALOG_PUBLISH_DELAY', '0.5'))
+
+# --- Настройки резервов ---
+# Сколько минут товар в корзине удерживается за покупателем
+RESERVATION_TTL_MINUTES = int(os.getenv('RESERVATION_TTL_MINUTES', '15'))
+# Как часто (в секундах) и какими пачками удалять истекшие резервы
+RESERVATION_SWEEP_INTERVAL = int(os.getenv('RESERVATION_SWEEP_INTERVAL', '60'))
+RESERVATION_SWEEP_BATCH = int(os.getenv('RESERVATION_SWEEP_BATCH', '500'))
+# Сколько пар одного размера один покупатель может держать в корзине
+RESERVATION_MAX_QUANTITY = int(os.getenv('RESERVATION_MAX_QUANTITY', '2'))
+# Сколько секунд подпись initData Mini App считается действительной (по auth_date)
+WEBAPP_AUTH_MAX_AGE = int(os.getenv('WEBAPP_AUTH_MAX_AGE', '86400'))
+
+# --- Популярность товаров ---
+# Как часто (в секундах) счетчики просмотров и добавлений в корзину сбрасываются в product_stats
+POPULARITY_FLUSH_INTERVAL = float(os.getenv('POPULARITY_FLUSH_INTERVAL', '60'))
+# Через сколько часов вклад события в рейтинг уменьшается вдвое
+POPULARITY_HALF_LIFE_HOURS = float(os.getenv('POPULARITY_HALF_LIFE_HOURS', '72'))
+POPULARITY_VIEW_WEIGHT = float(os.getenv('POPULARITY_VIEW_WEIGHT', '1'))
+POPULARITY_CART_WEIGHT = float(os.getenv('POPULARITY_CART_WEIGHT', '5'))
+
+# --- Обслуживание базы данных ---
+# Периоды задач в секундах; MAINTENANCE_TICK — как часто планировщик проверяет, что пора запускать
+MAINTENANCE_TICK = int(os.getenv('MAINTENANCE_TICK', '60'))
+MAINTENANCE_CHECKPOINT_INTERVAL = int(os.getenv('MAINTENANCE_CHECKPOINT_INTERVAL', '300'))
+MAINTENANCE_OPTIMIZE_INTERVAL = int(os.getenv('MAINTENANCE_OPTIMIZE_INTERVAL', '3600'))
+MAINTENANCE_CLEANUP_INTERVAL = int(os.getenv('MAINTENANCE_CLEANUP_INTERVAL', '3600'))
+MAINTENANCE_ANALYZE_INTERVAL = int(os.getenv('MAINTENANCE_ANALYZE_INTERVAL', '86400'))
+MAINTENANCE_VACUUM_INTERVAL = int(os.getenv('MAINTENANCE_VACUUM_INTERVAL', '86400'))
+# Окно низкой нагрузки (часы по локальному времени сервера) для ANALYZE и vacuum, например 3-6
+MAINTENANCE_OFFPEAK_HOURS = tuple(int(h) for h in os.getenv('MAINTENANCE_OFFPEAK_HOURS', '3-6').split('-'))
+MAINTENANCE_ANALYSIS_LIMIT = int(os.getenv('MAINTENANCE_ANALYSIS_LIMIT', '1000'))
+# incremental_vacuum: страниц за шаг, пауза между шагами (сек.) и максимум страниц за запуск
+MAINTENANCE_VACUUM_STEP_PAGES = int(os.getenv('MAINTENANCE_VACUUM_STEP_PAGES', '200'))
+MAINTENANCE_VACUUM_PAUSE = float(os.getenv('MAINTENANCE_VACUUM_PAUSE', '0.2'))
+MAINTENANCE_VACUUM_MAX_PAGES = int(os.getenv('MAINTENANCE_VACUUM_MAX_PAGES', '20000'))
+
+# --- Бэкапы ---
+BACKUP_DIR = Path(os.getenv('BACKUP_DIR', BASE_DIR / 'backups'))
+# Сколько последних бэкапов хранить
+BACKUP_KEEP = int(os.getenv('BACKUP_KEEP', '7'))
+# Предельная длительность снимка (сек.): дольше — копирование прерывается с ошибкой
+BACKUP_TIMEOUT = float(os.getenv('BACKUP_TIMEOUT', '600'))
+
+# --- Логирование ---
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+# json — по строке JSON на запись; text — прежний человекочитаемый формат
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+# Доля записей ниже WARNING, которая пишется для шумных логгеров (например, httpx логирует каждый getUpdates)
+LOG_SAMPLING = {'httpx': 0.05}
+for _override in os.getenv('LOG_SAMPLING', '').split(','):
+    try:
+        _name, _rate = _override.strip().split('=')
+        LOG_SAMPLING[_name] = float(_rate)
+    except ValueError:
+        if _override.strip():
+            print(f"ПРЕДУПРЕЖДЕНИЕ: Не удалось разобрать '{_override}' из LOG_SAMPLING.")
+
+# --- Трассировка ---
+TRACE_FILE = Path(os.getenv('TRACE_FILE', BASE_DIR / 'traces' / 'traces.jsonl'))
+TRACE_FILE_MAX_BYTES = int(os.getenv('TRACE_FILE_MAX_BYTES', str(10 * 1024 * 1024)))
+TRACE_FILE_BACKUPS = int(os.getenv('TRACE_FILE_BACKUPS', '5'))
+# Трасса медленнее TRACE_SLOW_MS сохраняется с вероятностью TRACE_SLOW_SAMPLE_RATE, остальные — TRACE_SAMPLE_RATE
+TRACE_SLOW_MS = float(os.getenv('TRACE_SLOW_MS', '1000'))
+TRACE_SLOW_SAMPLE_RATE = float(os.getenv('TRACE_SLOW_SAMPLE_RATE', '1.0'))
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', '0.01'))
+# Ограничение числа span'ов в одной трассе
+TRACE_MAX_SPANS = int(os.getenv('TRACE_MAX_SPANS', '500'))
+
+# --- Ограничение частоты запросов ---
+# Имя лимита: (запросов, за секунд). bot:* — на telegram_id, web:* — на проверенный
+# telegram_id из initData Mini App, а без него — на IP клиента
+RATE_LIMITS = {
+    'bot:start': (5, 30),
+    'bot:my_orders': (3, 15),
+    'bot:web_app_data': (5, 60),
+    'web:api_get_products': (30, 10),
+    'web:api_get_product_details': (30, 10),
+    'web:api_get_products_details': (30, 10),
+    'web:api_reserve_variant': (20, 10),
+    'web:api_track_product_view': (60, 10),
+}
+# Переопределение через .env, например: RATE_LIMIT_OVERRIDES=bot:my_orders=5/10,web:api_get_products=60/10
+for _override in os.getenv('RATE_LIMIT_OVERRIDES', '').split(','):
+    try:
+        _name, _spec = _override.strip().split('=')
+        _count, _seconds = _spec.split('/')
+        RATE_LIMITS[_name] = (int(_count), float(_seconds))
+    except ValueError:
+        if _override.strip():
+            print(f"ПРЕДУПРЕЖДЕНИЕ: Не удалось разобрать лимит '{_override}' из RATE_LIMIT_OVERRIDES.")
+
+# --- Настройки ботов ---
+# Сколько уведомлений покупателям в секунду отправляет фоновая очередь админ-бота
+NOTIFY_RATE_PER_SECOND = float(os.getenv('NOTIFY_RATE_PER_SECOND', '20'))
+# Заказов на одной странице входящих в админ-боте
+ORDERS_PER_PAGE = int(os.getenv('ORDERS_PER_PAGE', '10'))
+# Как часто (в секундах) PTB сбрасывает изменившиеся user_data и состояния диалогов в БД
+PERSISTENCE_UPDATE_INTERVAL = float(os.getenv('PERSISTENCE_UPDATE_INTERVAL', '5'))
+
+# --- Мониторинг и перезапуск ботов ---
+# Как часто измеряется задержка цикла событий бота и с какой задержки цикл считается заблокированным
+WATCHDOG_LAG_INTERVAL = float(os.getenv('WATCHDOG_LAG_INTERVAL', '1'))
+WATCHDOG_MAX_LOOP_LAG = float(os.getenv('WATCHDOG_MAX_LOOP_LAG', '0.5'))
+# Сколько секунд без успешного getUpdates бот считается неживым (long polling PTB — 10 сек.)
+WATCHDOG_POLL_STALE = float(os.getenv('WATCHDOG_POLL_STALE', '60'))
+# Задержка перезапуска упавшего бота: BASE, 2*BASE, 4*BASE... но не больше MAX
+WATCHDOG_BACKOFF_BASE = float(os.getenv('WATCHDOG_BACKOFF_BASE', '5'))
+WATCHDOG_BACKOFF_MAX = float(os.getenv('WATCHDOG_BACKOFF_MAX', '300'))
+# После стольких секунд стабильной работы задержка перезапуска сбрасывается
+WATCHDOG_STABLE_UPTIME = float(os.getenv('WATCHDOG_STABLE_UPTIME', '600'))
+# Адрес /healthz процесса ботов (run.py); HEALTH_PORT=0 отключает
+HEALTH_HOST = os.getenv('HEALTH_HOST', '127.0.0.1')
+HEALTH_PORT = int(os.getenv('HEALTH_PORT', '8081'))
+
+# --- Профилирование (/profile в админ-боте) ---
+# Интервал выборки стеков (0.01 = 100 раз в секунду), предельная длительность и размер сводки
+PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL', '0.01'))
+PROFILE_MAX_SECONDS = int(os.getenv('PROFILE_MAX_SECONDS', '120'))
+PROFILE_TOP_N = int(os.getenv('PROFILE_TOP_N', '15'))
+
 # --- Проверка критически важных переменных ---
 if not TOKEN:
     print("КРИТИЧЕСКАЯ ОШИБКА: TOKEN не найден в .env файле!")
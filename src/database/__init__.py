@@ -1,5 +1,7 @@
 # src/database/__init__.py
-from sqlalchemy import create_engine
+import math
+import zlib
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.orm import sessionmaker, declarative_base
 from config import DATABASE_URL
 
@@ -7,9 +9,71 @@ engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+
+def _logaddexp2(a, b):
+    """log2(2**a + 2**b) без переполнения: сложение счетов популярности, хранящихся как log2."""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    high, low = max(a, b), min(a, b)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def register_sqlite_functions(dbapi_connection, connection_record=None):
+    dbapi_connection.create_function("logaddexp2", 2, _logaddexp2, deterministic=True)
+
+
+event.listen(engine, "connect", register_sqlite_functions)
+
+
+def schema_fingerprint() -> int:
+    """
+    Отпечаток схемы: таблицы, колонки, индексы моделей и номер последней миграции.
+    Хранится в PRAGMA user_version, поэтому укладывается в 31 бит.
+    """
+    from database.migrations import MIGRATIONS
+    parts = [f"migration:{max((m[0] for m in MIGRATIONS), default=0)}"]
+    for name, table in sorted(Base.metadata.tables.items()):
+        columns = ",".join(f"{c.name}:{c.type}" for c in table.columns)
+        indexes = ",".join(sorted(i.name for i in table.indexes))
+        parts.append(f"{name}({columns})[{indexes}]")
+    return zlib.crc32("|".join(parts).encode()) & 0x7FFFFFFF
+
+
+def configure_storage(engine=engine):
+    """
+    Режим хранения, на который рассчитаны фоновые задачи (services/maintenance.py):
+    WAL — чтение и бэкапы не блокируют запись, чекпоинты делаются вручную;
+    auto_vacuum=INCREMENTAL — свободные страницы возвращаются по частям.
+    Оба режима сохраняются в файле базы; VACUUM для смены auto_vacuum нужен один раз.
+    """
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 2:
+            print("Включаю auto_vacuum=INCREMENTAL (однократный VACUUM)...")
+            conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.exec_driver_sql("VACUUM")
+        if conn.exec_driver_sql("PRAGMA journal_mode").scalar() != 'wal':
+            conn.exec_driver_sql("PRAGMA journal_mode = WAL")
+
+
 def init_db():
     # Импортируем модели здесь, чтобы избежать циклических зависимостей
     from database import models
+    from database.migrations import run_migrations
     print("Инициализация базы данных...")
+    configure_storage()
+
+    # Если схема не менялась с прошлого запуска, пропускаем create_all и миграции
+    fingerprint = schema_fingerprint()
+    with engine.connect() as conn:
+        stored = conn.execute(text("PRAGMA user_version")).scalar()
+    if stored == fingerprint:
+        print("Схема базы данных актуальна, инициализация пропущена.")
+        return
+
     Base.metadata.create_all(bind=engine)
-    print("База данных успешно инициализирована.")
\ No newline at end of file
+    version = run_migrations(engine)
+    with engine.begin() as conn:
+        conn.execute(text(f"PRAGMA user_version = {fingerprint}"))
+    print(f"База данных успешно инициализирована (версия схемы {version}).")
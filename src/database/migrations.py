@@ -0,0 +1,49 @@
+# src/database/migrations.py
+import logging
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Версионированные миграции: (версия, описание, SQL-выражения).
+# create_all создает только отсутствующие таблицы, поэтому индексы и изменения
+# существующих таблиц доходят до живой базы только через этот список.
+# Выражения должны быть идемпотентны (IF NOT EXISTS): на свежей базе
+# те же индексы уже созданы по описанию моделей.
+MIGRATIONS = [
+    (1, "Индексы для горячих фильтров", [
+        "CREATE INDEX IF NOT EXISTS ix_orders_user_created ON orders (user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_product_variants_product_id ON product_variants (product_id)",
+        "CREATE INDEX IF NOT EXISTS ix_products_active_id ON products (is_active, id)",
+    ]),
+    (2, "Индекс для входящих заказов в админ-боте", [
+        "CREATE INDEX IF NOT EXISTS ix_orders_status_created ON orders (status, created_at)",
+    ]),
+]
+
+
+def get_schema_version(engine: Engine) -> int:
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, description TEXT NOT NULL, "
+            "applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+        ))
+        return conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")).scalar()
+
+
+def run_migrations(engine: Engine) -> int:
+    """Применяет все миграции новее текущей версии схемы. Возвращает итоговую версию."""
+    current = get_schema_version(engine)
+    for version, description, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        # Каждая миграция — отдельная транзакция: либо применена целиком, либо нет
+        with engine.begin() as conn:
+            for statement in statements:
+                conn.execute(text(statement))
+            conn.execute(text("INSERT INTO schema_migrations (version, description) VALUES (:v, :d)"),
+                         {'v': version, 'd': description})
+        logger.info("Применена миграция %s: %s", version, description)
+        current = version
+    return current
@@ -1,6 +1,6 @@
 # src/database/models.py
 from sqlalchemy import (Column, Integer, String, Float, Boolean,
-                        ForeignKey, Text, DateTime)
+                        ForeignKey, Text, DateTime, Index, LargeBinary)
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from . import Base # Используем относительный импорт
@@ -25,6 +25,9 @@ class Product(Base):
     photo_url = Column(String, nullable=False)
     is_active = Column(Boolean, default=True)
     variants = relationship("ProductVariant", back_populates="product", cascade="all, delete-orphan")
+    __table_args__ = (
+        Index("ix_products_active_id", "is_active", "id"),
+    )
 
 class ProductVariant(Base):
     __tablename__ = "product_variants"
@@ -34,6 +37,13 @@ class ProductVariant(Base):
     price = Column(Float, nullable=False)
     stock = Column(Integer, nullable=False, default=0)
     product = relationship("Product", back_populates="variants")
+    __table_args__ = (
+        Index("ix_product_variants_product_id", "product_id"),
+    )
+
+# Статусы заказа в порядке жизненного цикла и разрешенные переходы для массовой смены
+ORDER_STATUSES = ["Обработка", "Оплачен", "Отправлен", "Доставлен"]
+ORDER_STATUS_NEXT = {current: following for current, following in zip(ORDER_STATUSES, ORDER_STATUSES[1:])}
 
 class Order(Base):
     __tablename__ = "orders"
@@ -41,6 +51,50 @@ class Order(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     items_json = Column(Text, nullable=False)
     total_amount = Column(Float, nullable=False)
-    status = Column(String, default="Обработка")
+    status = Column(String, default=ORDER_STATUSES[0])
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    user = relationship("User", back_populates="orders")
\ No newline at end of file
+    user = relationship("User", back_populates="orders")
+    __table_args__ = (
+        Index("ix_orders_user_created", "user_id", "created_at"),
+        Index("ix_orders_status_created", "status", "created_at"),
+    )
+
+
+class Reservation(Base):
+    __tablename__ = "reservations"
+    id = Column(Integer, primary_key=True, index=True)
+    variant_id = Column(Integer, ForeignKey("product_variants.id", ondelete="CASCADE"), nullable=False)
+    telegram_id = Column(Integer, nullable=False)
+    quantity = Column(Integer, nullable=False)
+    # Храним наивное UTC-время: SQLite сравнивает даты как строки
+    expires_at = Column(DateTime, nullable=False)
+    __table_args__ = (
+        Index("ix_reservations_variant_expires", "variant_id", "expires_at"),
+        Index("ix_reservations_user_variant", "telegram_id", "variant_id"),
+        Index("ix_reservations_expires", "expires_at"),
+    )
+
+
+# Счетчики популярности товаров; пишутся пачками из services/popularity.py
+class ProductStats(Base):
+    __tablename__ = "product_stats"
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    views = Column(Integer, nullable=False, default=0)
+    carts = Column(Integer, nullable=False, default=0)
+    # log2 суммы событий с весом 2**(t / период полураспада): порядок по score
+    # совпадает с порядком по затухающему рейтингу на любой момент времени
+    score = Column(Float, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+    __table_args__ = (
+        Index("ix_product_stats_score", "score"),
+    )
+
+
+# Состояние ботов: user_data, chat_data, bot_data и состояния диалогов
+class PersistenceEntry(Base):
+    __tablename__ = "bot_persistence"
+    bot_name = Column(String, primary_key=True)
+    kind = Column(String, primary_key=True)
+    name = Column(String, primary_key=True, default="")
+    key = Column(String, primary_key=True)
+    value = Column(LargeBinary, nullable=False)
@@ -0,0 +1,153 @@
+# src/database/plan_checker.py
+"""
+Проверка планов запросов: прогоняет функции database/queries.py на засеянной
+временной базе, для каждого выполненного выражения делает EXPLAIN QUERY PLAN
+и падает, если горячий запрос читает таблицу целиком (SCAN без индекса).
+
+Запуск из папки src:  python -m database.plan_checker
+"""
+import inspect
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, models, queries, register_sqlite_functions
+from database.migrations import run_migrations
+
+# Полный проход по таблице: "SCAN products" (в старых SQLite — "SCAN TABLE products").
+# Проход по индексу ("SCAN ... USING INDEX") сюда не попадает.
+_FULL_SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(\w+)$')
+
+# Публичные функции queries.*, которые проверять не нужно (с причиной).
+# Любая другая функция без сценария — ошибка проверки, а не тихий пропуск.
+EXEMPT_FUNCTIONS: dict[str, str] = {}
+
+# Запросы, которым полный проход разрешен: админский список товаров без фильтра
+# и выгрузка всех счетов популярности при публикации снимка каталога
+ALLOWED_FULL_SCANS = {
+    'get_paginated_products': {'products'},
+    'get_popularity_scores': {'product_stats'},
+}
+
+
+def _seed(db):
+    users = [models.User(telegram_id=1000 + i, username=f"user{i}", full_name=f"User {i}") for i in range(20)]
+    db.add_all(users)
+    for i in range(30):
+        product = models.Product(name=f"Product {i}", brand=f"Brand {i % 5}", category="Кроссовки",
+                                 description="", composition="", photo_url="https://example.com/p.jpg",
+                                 is_active=i % 4 != 0)
+        product.variants = [models.ProductVariant(size=str(40 + s), price=10000 + s, stock=s) for s in range(4)]
+        db.add(product)
+    db.flush()
+    for user in users:
+        for _ in range(3):
+            db.add(models.Order(user_id=user.id, items_json="[]", total_amount=10000))
+    db.commit()
+
+
+def _scenarios(db):
+    """Вызовы queries.*, планы которых проверяются. Имя сценария = имя функции."""
+    tg_user = SimpleNamespace(id=1001, username="user1", full_name="User 1")
+    user = queries.get_or_create_user(db, tg_user)
+    variant = db.query(models.ProductVariant).filter(models.ProductVariant.stock > 1).first()
+
+    yield 'get_or_create_user', lambda: queries.get_or_create_user(db, tg_user)
+    yield 'get_active_products_with_variants', lambda: queries.get_active_products_with_variants(db)
+    yield 'get_product_details', lambda: queries.get_product_details(db, variant.product_id).variants
+    yield 'get_products_details', lambda: queries.get_products_details(db, [1, 2, 3])
+    yield 'get_paginated_products', lambda: queries.get_paginated_products(db, 1, 5)
+    yield 'get_variant_product_ids', lambda: queries.get_variant_product_ids(db, [variant.id])
+    yield 'add_product_stats', lambda: queries.add_product_stats(
+        db, {variant.product_id: (3, 1, 10.0)}, datetime.utcnow())
+    yield 'get_popularity_scores', lambda: queries.get_popularity_scores(db)
+    yield 'get_active_holds', lambda: queries.get_active_holds(db, [variant.id])
+    yield 'reserve_variant', lambda: queries.reserve_variant(db, user.telegram_id, variant.id, 1,
+                                                             timedelta(minutes=15))
+    yield 'release_expired_reservations', lambda: queries.release_expired_reservations(db, 100)
+    yield 'create_order', lambda: queries.create_order(db, user, {
+        'items': [{'variant_id': variant.id, 'quantity': 1}], 'total_amount': variant.price})
+    yield 'get_user_orders', lambda: queries.get_user_orders(db, user)
+    since = datetime.utcnow() - timedelta(days=7)
+    yield 'get_orders_page', lambda: queries.get_orders_page(db, models.ORDER_STATUSES[0], since, 5, 10)
+    yield 'count_orders', lambda: queries.count_orders(db, models.ORDER_STATUSES[0], since)
+    yield 'bulk_update_order_status', lambda: queries.bulk_update_order_status(
+        db, models.ORDER_STATUSES[0], models.ORDER_STATUSES[1], since)
+    yield 'create_product', lambda: queries.create_product(db, {
+        'name': "New", 'brand': "Brand 0", 'category': "Кроссовки", 'description': "", 'composition': "",
+        'photo_url': "https://example.com/p.jpg", 'variants': [{'size': "42", 'price': 10000, 'stock': 1}]})
+    yield 'delete_product', lambda: queries.delete_product(db, variant.product_id)
+
+
+def _public_query_functions() -> set[str]:
+    return {name for name, func in inspect.getmembers(queries, inspect.isfunction)
+            if func.__module__ == queries.__name__ and not name.startswith('_')}
+
+
+def check_query_plans() -> list[str]:
+    """Возвращает список нарушений (пустой, если все горячие запросы используют индексы)."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{Path(tmp_dir) / 'plan_check.db'}")
+        event.listen(engine, 'connect', register_sqlite_functions)
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        captured = []
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if executemany:
+                parameters = parameters[0] if parameters else ()
+            captured.append((statement, parameters))
+
+        violations = []
+        covered = set()
+        db = Session()
+        try:
+            _seed(db)
+            for name, call in _scenarios(db):
+                covered.add(name)
+                captured.clear()
+                call()
+                statements = list(captured)
+                allowed = ALLOWED_FULL_SCANS.get(name, set())
+
+                with engine.connect() as conn:
+                    raw = conn.connection.driver_connection
+                    for statement, parameters in statements:
+                        if not statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE', 'INSERT')):
+                            continue
+                        for row in raw.execute(f"EXPLAIN QUERY PLAN {statement}", parameters):
+                            detail = row[-1]
+                            match = _FULL_SCAN_RE.match(detail)
+                            if match and match.group(1) not in allowed:
+                                violations.append(f"{name}: {detail}\n    {' '.join(statement.split())}")
+        finally:
+            db.close()
+            engine.dispose()
+
+    for name in sorted(_public_query_functions() - covered - set(EXEMPT_FUNCTIONS)):
+        violations.append(f"{name}: нет сценария в plan_checker._scenarios (или исключения в EXEMPT_FUNCTIONS)")
+    return violations
+
+
+def main() -> int:
+    violations = check_query_plans()
+    if violations:
+        print("Найдены полные проходы по таблицам в горячих запросах:")
+        for violation in violations:
+            print(f"  - {violation}")
+        return 1
+    print("Все проверенные запросы используют индексы.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
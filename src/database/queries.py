@@ -1,11 +1,19 @@
 # src/database/queries.py
 import json
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from database.models import User, Product, ProductVariant, Order
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import desc, func, select, insert, delete, update, literal, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from database.models import User, Product, ProductVariant, Order, Reservation, ProductStats
+from utils.tracing import traced
+
+
+def _utcnow() -> datetime:
+    return datetime.utcnow()
 
 
 # --- User Queries ---
+@traced('queries.get_or_create_user')
 def get_or_create_user(db: Session, tg_user):
     user = db.query(User).filter(User.telegram_id == tg_user.id).first()
     if not user:
@@ -21,11 +29,13 @@ def get_or_create_user(db: Session, tg_user):
 
 
 # --- Product Queries ---
+@traced('queries.get_active_products_with_variants')
 def get_active_products_with_variants(db: Session):
     products = db.query(Product).filter(Product.is_active == True).order_by(desc(Product.id)).all()
+    holds = get_active_holds(db)
     result = []
     for p in products:
-        variants_in_stock = [v for v in p.variants if v.stock > 0]
+        variants_in_stock = [v for v in p.variants if v.stock - holds.get(v.id, 0) > 0]
         min_price = min((v.price for v in variants_in_stock), default=None)
 
         # Не добавляем товар в каталог, если ни одного варианта нет в наличии
@@ -40,10 +50,21 @@ def get_active_products_with_variants(db: Session):
     return result
 
 
+@traced('queries.get_product_details')
 def get_product_details(db: Session, product_id: int):
     return db.query(Product).filter(Product.id == product_id).first()
 
 
+@traced('queries.get_products_details')
+def get_products_details(db: Session, product_ids: list[int]):
+    # Варианты всех товаров подгружаются одним дополнительным запросом с IN (...)
+    return (db.query(Product)
+            .options(selectinload(Product.variants))
+            .filter(Product.id.in_(product_ids))
+            .all())
+
+
+@traced('queries.get_paginated_products')
 def get_paginated_products(db: Session, page: int, per_page: int = 5):
     offset = page * per_page
     products = db.query(Product).order_by(desc(Product.id)).offset(offset).limit(per_page).all()
@@ -51,6 +72,7 @@ def get_paginated_products(db: Session, page: int, per_page: int = 5):
     return products, total
 
 
+@traced('queries.create_product')
 def create_product(db: Session, product_data: dict):
     new_product = Product(
         name=product_data['name'], brand=product_data['brand'], category=product_data['category'],
@@ -68,6 +90,7 @@ def create_product(db: Session, product_data: dict):
     return new_product
 
 
+@traced('queries.delete_product')
 def delete_product(db: Session, product_id: int):
     product = db.query(Product).filter(Product.id == product_id).first()
     if product:
@@ -77,17 +100,131 @@ def delete_product(db: Session, product_id: int):
     return False
 
 
+# --- Popularity Queries ---
+@traced('queries.get_variant_product_ids')
+def get_variant_product_ids(db: Session, variant_ids: list[int]) -> dict[int, int]:
+    rows = db.query(ProductVariant.id, ProductVariant.product_id).filter(ProductVariant.id.in_(variant_ids))
+    return dict(rows.all())
+
+
+@traced('queries.add_product_stats')
+def add_product_stats(db: Session, stats: dict[int, tuple[int, int, float]], now: datetime) -> int:
+    """
+    Прибавляет накопленные счетчики одним пакетным UPSERT.
+    stats: product_id -> (просмотры, добавления в корзину, прирост score в log2).
+    Товары, которых уже нет в базе, пропускаются. Возвращает число записанных строк.
+    """
+    existing = {product_id for (product_id,) in db.query(Product.id).filter(Product.id.in_(list(stats)))}
+    rows = [{'product_id': product_id, 'views': views, 'carts': carts, 'score': score, 'updated_at': now}
+            for product_id, (views, carts, score) in stats.items() if product_id in existing]
+    if not rows:
+        return 0
+
+    stmt = sqlite_insert(ProductStats)
+    stmt = stmt.on_conflict_do_update(index_elements=[ProductStats.product_id], set_={
+        'views': ProductStats.views + stmt.excluded.views,
+        'carts': ProductStats.carts + stmt.excluded.carts,
+        # Сложение затухающих сумм в log2-представлении (функция регистрируется в database/__init__.py)
+        'score': func.logaddexp2(ProductStats.score, stmt.excluded.score),
+        'updated_at': stmt.excluded.updated_at,
+    })
+    db.execute(stmt, rows)
+    db.commit()
+    return len(rows)
+
+
+@traced('queries.get_popularity_scores')
+def get_popularity_scores(db: Session) -> dict[int, float]:
+    return dict(db.query(ProductStats.product_id, ProductStats.score).all())
+
+
+# --- Reservation Queries ---
+def _held_quantity(variant_id, now: datetime):
+    """Подзапрос: сколько единиц варианта сейчас удерживается в корзинах."""
+    return (select(func.coalesce(func.sum(Reservation.quantity), 0))
+            .where(Reservation.variant_id == variant_id, Reservation.expires_at > now)
+            .scalar_subquery())
+
+
+@traced('queries.get_active_holds')
+def get_active_holds(db: Session, variant_ids: list[int] | None = None) -> dict[int, int]:
+    """Возвращает {variant_id: количество в активных резервах} одним GROUP BY."""
+    stmt = (select(Reservation.variant_id, func.sum(Reservation.quantity))
+            .where(Reservation.expires_at > _utcnow())
+            .group_by(Reservation.variant_id))
+    if variant_ids is not None:
+        stmt = stmt.where(Reservation.variant_id.in_(variant_ids))
+    return {variant_id: held for variant_id, held in db.execute(stmt)}
+
+
+@traced('queries.reserve_variant')
+def reserve_variant(db: Session, telegram_id: int, variant_id: int, quantity: int, ttl: timedelta):
+    """
+    Устанавливает резерв пользователя на вариант в `quantity` штук (0 — снять резерв).
+    Проверка остатка и вставка выполняются одним INSERT ... SELECT, поэтому
+    два покупателя не могут одновременно занять последнюю пару.
+    Возвращает время истечения резерва или None, если товара не хватает.
+    """
+    now = _utcnow()
+    # Старый резерв пользователя на этот вариант заменяется новым
+    db.execute(delete(Reservation).where(Reservation.telegram_id == telegram_id,
+                                         Reservation.variant_id == variant_id))
+    if quantity <= 0:
+        db.commit()
+        return now
+
+    expires_at = now + ttl
+    available = select(literal(variant_id), literal(telegram_id), literal(quantity), literal(expires_at)) \
+        .select_from(ProductVariant) \
+        .where(ProductVariant.id == variant_id,
+               ProductVariant.stock - _held_quantity(variant_id, now) >= quantity)
+    result = db.execute(insert(Reservation).from_select(
+        ['variant_id', 'telegram_id', 'quantity', 'expires_at'], available))
+
+    if result.rowcount != 1:
+        db.rollback()
+        return None
+    db.commit()
+    return expires_at
+
+
+@traced('queries.release_expired_reservations')
+def release_expired_reservations(db: Session, batch_size: int = 500) -> int:
+    """Удаляет одну пачку истекших резервов и возвращает число удаленных строк."""
+    expired_ids = (select(Reservation.id)
+                   .where(Reservation.expires_at <= _utcnow())
+                   .limit(batch_size)
+                   .scalar_subquery())
+    result = db.execute(delete(Reservation).where(Reservation.id.in_(expired_ids)))
+    db.commit()
+    return result.rowcount
+
+
 # --- Order Queries ---
+@traced('queries.create_order')
 def create_order(db: Session, user: User, order_data: dict):
-    # Уменьшаем кол-во товара на складе
-    for item in order_data['items']:
+    items = order_data['items']
+    now = _utcnow()
+
+    # Резервы покупателя превращаются в продажу: снимаем их в той же транзакции,
+    # тогда проверка ниже учитывает только чужие активные резервы
+    variant_ids = [item.get('variant_id') for item in items]
+    db.execute(delete(Reservation).where(Reservation.telegram_id == user.telegram_id,
+                                         Reservation.variant_id.in_(variant_ids)))
+
+    # Уменьшаем кол-во товара на складе условным UPDATE — без отдельного чтения остатка
+    for item in items:
         variant_id = item.get('variant_id')
         quantity = item.get('quantity', 0)
 
-        variant = db.query(ProductVariant).filter(ProductVariant.id == variant_id).first()
-        if variant and variant.stock >= quantity:
-            variant.stock -= quantity
-        else:
+        result = db.execute(
+            update(ProductVariant)
+            .where(ProductVariant.id == variant_id,
+                   ProductVariant.stock - _held_quantity(variant_id, now) >= quantity)
+            .values(stock=ProductVariant.stock - quantity)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
             # Если товара не хватает, вызываем исключение, чтобы откатить транзакцию
             raise ValueError(f"Недостаточно товара на складе для варианта ID {variant_id}")
 
@@ -102,5 +239,65 @@ def create_order(db: Session, user: User, order_data: dict):
     return new_order
 
 
+@traced('queries.get_user_orders')
 def get_user_orders(db: Session, user: User, limit: int = 5):
-    return db.query(Order).filter(Order.user_id == user.id).order_by(desc(Order.created_at)).limit(limit).all()
\ No newline at end of file
+    return db.query(Order).filter(Order.user_id == user.id).order_by(desc(Order.created_at)).limit(limit).all()
+
+
+# --- Admin Order Inbox Queries ---
+def _orders_filter(query, status: str, since: datetime | None):
+    query = query.filter(Order.status == status)
+    if since is not None:
+        query = query.filter(Order.created_at >= since)
+    return query
+
+
+@traced('queries.get_orders_page')
+def get_orders_page(db: Session, status: str, since: datetime | None = None,
+                    cursor_id: int | None = None, limit: int = 10):
+    """
+    Страница заказов со статусом `status`, от новых к старым. Пагинация по ключу
+    (created_at, id) идет по индексу ix_orders_status_created без OFFSET.
+    Возвращает (заказы, есть_ли_следующая_страница).
+    """
+    query = _orders_filter(db.query(Order).options(selectinload(Order.user)), status, since)
+    if cursor_id is not None:
+        # created_at курсора берем подзапросом: сравнение идет с сырым значением из БД,
+        # без перевода в datetime и обратно (SQLite сравнивает даты как строки)
+        cursor_created_at = select(Order.created_at).where(Order.id == cursor_id).scalar_subquery()
+        query = query.filter(tuple_(Order.created_at, Order.id) < tuple_(cursor_created_at, cursor_id))
+
+    orders = query.order_by(desc(Order.created_at), desc(Order.id)).limit(limit + 1).all()
+    return orders[:limit], len(orders) > limit
+
+
+@traced('queries.count_orders')
+def count_orders(db: Session, status: str, since: datetime | None = None) -> int:
+    return _orders_filter(db.query(func.count(Order.id)), status, since).scalar()
+
+
+@traced('queries.bulk_update_order_status')
+def bulk_update_order_status(db: Session, from_status: str, to_status: str,
+                             since: datetime | None = None, order_ids: list[int] | None = None):
+    """
+    Переводит заказы из from_status в to_status одним UPDATE (все по фильтру или только order_ids).
+    Возвращает [(order_id, telegram_id покупателя)] для уведомлений.
+    """
+    affected = _orders_filter(db.query(Order.id, User.telegram_id).join(User), from_status, since)
+    if order_ids is not None:
+        affected = affected.filter(Order.id.in_(order_ids))
+
+    recipients = {order_id: telegram_id for order_id, telegram_id in affected.all()}
+    if not recipients:
+        return []
+    # Обновляем только прочитанные заказы: заказ, появившийся между SELECT и UPDATE,
+    # не должен сменить статус без уведомления. RETURNING отсекает те, что успели
+    # перевести параллельно (статус уже не from_status).
+    stmt = (update(Order)
+            .where(Order.id.in_(list(recipients)), Order.status == from_status)
+            .values(status=to_status)
+            .returning(Order.id)
+            .execution_options(synchronize_session=False))
+    updated = db.execute(stmt).scalars().all()
+    db.commit()
+    return [(order_id, recipients[order_id]) for order_id in sorted(updated)]
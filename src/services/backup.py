@@ -0,0 +1,160 @@
+# src/services/backup.py
+"""
+Онлайн-бэкапы SQLite через VACUUM INTO: снимок делается за одну читающую транзакцию,
+поэтому его не перезапускает параллельная запись (в отличие от пошагового backup API),
+а в режиме WAL запись заказов во время копирования не останавливается.
+
+Восстановление (при остановленных ботах), запуск из папки src:
+    python -m services.backup restore <файл .db.gz>
+"""
+import gzip
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import config
+from database import engine
+
+logger = logging.getLogger(__name__)
+
+
+def _database_path() -> Path:
+    return Path(engine.url.database)
+
+
+def create_backup(progress=None) -> Path:
+    """
+    Делает сжатый снимок базы в BACKUP_DIR и удаляет старые сверх BACKUP_KEEP.
+    progress(written_bytes, total_bytes) вызывается по ходу копирования не чаще раза в полсекунды.
+    Дольше BACKUP_TIMEOUT копирование не идет: sqlite3.OperationalError (interrupted).
+    """
+    backup_dir = config.BACKUP_DIR
+    backup_dir.mkdir(parents=True, exist_ok=True)
+    archive = backup_dir / f"vibesresell-{datetime.now().strftime('%Y%m%d-%H%M%S')}.db.gz"
+    db_path = _database_path()
+    total = max(db_path.stat().st_size, 1)
+
+    with tempfile.TemporaryDirectory(dir=backup_dir) as tmp_dir:
+        tmp_db = Path(tmp_dir) / 'snapshot.db'
+        deadline = time.monotonic() + config.BACKUP_TIMEOUT
+        last_reported = {'at': 0.0}
+
+        def on_progress():
+            now = time.monotonic()
+            if now > deadline:
+                # Ненулевой ответ прерывает VACUUM INTO
+                return 1
+            if progress is not None and now - last_reported['at'] >= 0.5:
+                last_reported['at'] = now
+                written = tmp_db.stat().st_size if tmp_db.exists() else 0
+                progress(min(written, total), total)
+            return 0
+
+        source = sqlite3.connect(db_path, timeout=30)
+        try:
+            source.set_progress_handler(on_progress, 10000)
+            source.execute("VACUUM INTO ?", (str(tmp_db),))
+        finally:
+            source.close()
+        if progress is not None:
+            progress(total, total)
+
+        tmp_archive = archive.with_suffix('.tmp')
+        with open(tmp_db, 'rb') as src, gzip.open(tmp_archive, 'wb', compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, length=1024 * 1024)
+        os.replace(tmp_archive, archive)
+
+    rotate_backups()
+    logger.info("Создан бэкап базы данных: %s (%s байт)", archive, archive.stat().st_size)
+    return archive
+
+
+def rotate_backups() -> list[Path]:
+    """Оставляет BACKUP_KEEP самых свежих бэкапов и возвращает удаленные."""
+    archives = sorted(config.BACKUP_DIR.glob('vibesresell-*.db.gz'), reverse=True)
+    removed = archives[config.BACKUP_KEEP:]
+    for old in removed:
+        old.unlink(missing_ok=True)
+    return removed
+
+
+def _unpack(archive: Path, target: Path) -> None:
+    with gzip.open(archive, 'rb') as src, open(target, 'wb') as dst:
+        shutil.copyfileobj(src, dst, length=1024 * 1024)
+
+
+def _check(db_path: Path) -> tuple[bool, str]:
+    conn = sqlite3.connect(db_path)
+    try:
+        result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        if result != 'ok':
+            return False, f"integrity_check: {result}"
+        counts = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                  for table in ('products', 'product_variants', 'orders', 'users')}
+        return True, ", ".join(f"{table}: {count}" for table, count in counts.items())
+    except sqlite3.DatabaseError as e:
+        return False, str(e)
+    finally:
+        conn.close()
+
+
+def verify_backup(archive: Path) -> tuple[bool, str]:
+    """Распаковывает бэкап во временный файл и проверяет integrity_check и основные таблицы."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_db = Path(tmp_dir) / 'verify.db'
+        _unpack(archive, tmp_db)
+        return _check(tmp_db)
+
+
+def _save_current(db_path: Path, target: Path) -> None:
+    """
+    Страховочная копия текущей базы вместе с WAL. После аварийной остановки
+    закоммиченные транзакции могут лежать только в -wal: чекпоинт переносит их
+    в основной файл, а VACUUM INTO в любом случае читает базу с учетом WAL.
+    """
+    target.unlink(missing_ok=True)
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("VACUUM INTO ?", (str(target),))
+    finally:
+        conn.close()
+
+
+def restore_backup(archive: Path) -> tuple[bool, str]:
+    """
+    Восстанавливает базу из бэкапа. Файл подменяется атомарно и только после
+    успешной проверки; текущая база сохраняется рядом с суффиксом .before-restore.
+    Запускать при остановленных ботах.
+    """
+    db_path = _database_path()
+    tmp_db = db_path.with_name(f"{db_path.name}.restore-tmp")
+    _unpack(archive, tmp_db)
+
+    ok, details = _check(tmp_db)
+    if not ok:
+        tmp_db.unlink(missing_ok=True)
+        return False, details
+
+    if db_path.exists():
+        _save_current(db_path, db_path.with_name(f"{db_path.name}.before-restore"))
+    os.replace(tmp_db, db_path)
+    # WAL и журнал старой базы к восстановленной не относятся (их содержимое уже в копии)
+    for suffix in ('-wal', '-shm', '-journal'):
+        db_path.with_name(db_path.name + suffix).unlink(missing_ok=True)
+    return True, details
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != 'restore':
+        print("Использование: python -m services.backup restore <файл .db.gz>")
+        sys.exit(2)
+    restored, info = restore_backup(Path(sys.argv[2]))
+    print(("База восстановлена: " if restored else "Бэкап не прошел проверку: ") + info)
+    sys.exit(0 if restored else 1)
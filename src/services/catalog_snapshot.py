@@ -0,0 +1,168 @@
+# src/services/catalog_snapshot.py
+import atexit
+import gzip
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from dataclasses import dataclass
+
+import config
+from database import SessionLocal, queries
+from utils.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+# Заголовок файла: магия, версия формата, версия снимка, длина JSON, длина gzip-копии
+_HEADER = struct.Struct('<4sIQQQ')
+_MAGIC = b'VRCS'
+_FORMAT_VERSION = 1
+
+
+# ==================== Публикация ====================
+def order_by_popularity(products: list[dict], scores: dict[int, float]) -> list[dict]:
+    """Сначала товары с большим счетом; без счета и при равенстве — в исходном порядке (новые выше)."""
+    return sorted(products, key=lambda p: scores.get(p['id'], -math.inf), reverse=True)
+
+
+def _write_snapshot(path, body: bytes, version: int) -> None:
+    compressed = gzip.compress(body, compresslevel=6)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, _FORMAT_VERSION, version, len(body), len(compressed)))
+        f.write(body)
+        f.write(compressed)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def publish_catalog() -> int:
+    """
+    Строит каталог из БД и атомарно заменяет файлы снимков (запись во временный файл + os.replace):
+    в обычном порядке и упорядоченный по популярности. Возвращает версию опубликованного снимка.
+    """
+    db = SessionLocal()
+    try:
+        products = queries.get_active_products_with_variants(db)
+        scores = queries.get_popularity_scores(db)
+    finally:
+        db.close()
+
+    body = dumps(products)
+    version = time.time_ns()
+    _write_snapshot(config.CATALOG_SNAPSHOT_PATH, body, version)
+    _write_snapshot(config.CATALOG_POPULAR_SNAPSHOT_PATH, dumps(order_by_popularity(products, scores)), version)
+
+    logger.info("Опубликован снимок каталога v%s: %s товаров, %s байт", version, len(products), len(body))
+    return version
+
+
+_publish_event = threading.Event()
+_publisher_stop = threading.Event()
+_publisher_lock = threading.Lock()
+_publisher_thread = None
+
+
+def _publisher_loop():
+    while not _publisher_stop.is_set():
+        _publish_event.wait()
+        # Склеиваем серию изменений (например, пачку резервов) в одну публикацию.
+        # Ждем на Event, а не в time.sleep: остановка не ждет конца паузы
+        if _publisher_stop.wait(config.CATALOG_PUBLISH_DELAY):
+            break
+        _publish_event.clear()
+        try:
+            publish_catalog()
+        except Exception as e:
+            logger.error("Ошибка публикации снимка каталога: %s", e, exc_info=True)
+
+
+def _shutdown() -> None:
+    _publisher_stop.set()
+    # Будим поток, если он ждет следующего изменения
+    _publish_event.set()
+
+
+def request_publish() -> None:
+    """Отмечает, что товары или остатки изменились; снимок пересоберется в фоне."""
+    global _publisher_thread
+    with _publisher_lock:
+        if _publisher_thread is None:
+            atexit.register(_shutdown)
+        if _publisher_thread is None or not _publisher_thread.is_alive():
+            _publisher_thread = threading.Thread(target=_publisher_loop, name="CatalogPublisherThread", daemon=True)
+            _publisher_thread.start()
+    _publish_event.set()
+
+
+# ==================== Чтение ====================
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    version: int
+    body: memoryview
+    gzip_body: memoryview
+
+
+class CatalogSnapshotReader:
+    """
+    Отображает файл снимка в память (mmap) и следит за его заменой.
+    Все воркеры делят одни и те же страницы page cache, поэтому каталог
+    не дублируется в памяти каждого процесса.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._inode = None
+        self._snapshot = None
+
+    def current(self) -> CatalogSnapshot | None:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+
+        # Новый снимок = новый файл после os.replace, то есть другой inode
+        inode = (stat.st_dev, stat.st_ino)
+        if inode == self._inode:
+            return self._snapshot
+
+        with self._lock:
+            if inode != self._inode:
+                self._reload(inode)
+        return self._snapshot
+
+    def _reload(self, inode) -> None:
+        try:
+            with open(self.path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError) as e:
+            logger.warning("Не удалось открыть снимок каталога: %s", e)
+            return
+
+        magic, format_version, version, body_len, gzip_len = _HEADER.unpack_from(mapped, 0)
+        if magic != _MAGIC or format_version != _FORMAT_VERSION:
+            logger.warning("Неизвестный формат снимка каталога: %s", self.path)
+            self._inode = inode
+            return
+        if self._snapshot is not None and version <= self._snapshot.version:
+            self._inode = inode
+            return
+
+        view = memoryview(mapped)
+        start = _HEADER.size
+        # Старое отображение закроется само, когда его перестанут читать текущие ответы
+        self._snapshot = CatalogSnapshot(
+            version=version,
+            body=view[start:start + body_len],
+            gzip_body=view[start + body_len:start + body_len + gzip_len],
+        )
+        self._inode = inode
+
+
+reader = CatalogSnapshotReader(config.CATALOG_SNAPSHOT_PATH)
+popular_reader = CatalogSnapshotReader(config.CATALOG_POPULAR_SNAPSHOT_PATH)
@@ -2,10 +2,12 @@
 import requests
 import logging
 from config import IMGBB_API_KEY
+from utils.tracing import traced
 
 logger = logging.getLogger(__name__)
 
 
+@traced('imgbb.upload')
 def upload_image(image_bytes: bytes) -> str | None:
     """Загружает байты изображения на ImgBB и возвращает URL."""
     if not IMGBB_API_KEY:
@@ -31,20 +33,20 @@ def upload_image(image_bytes: bytes) -> str | None:
 
         if result.get('success'):
             image_url = result['data']['url']
-            logger.info(f"Изображение успешно загружено на ImgBB: {image_url}")
+            logger.info("Изображение успешно загружено на ImgBB: %s", image_url)
             return image_url
         else:
             # Логируем ошибку, которую вернуло API
             error_message = result.get('error', {}).get('message', 'Неизвестная ошибка от API ImgBB')
-            logger.error(f"Ошибка от API ImgBB: {error_message}")
+            logger.error("Ошибка от API ImgBB: %s", error_message)
             return None
 
     except requests.exceptions.Timeout:
         logger.error("Сетевая ошибка при загрузке на ImgBB: превышен таймаут.")
         return None
     except requests.exceptions.RequestException as e:
-        logger.error(f"Сетевая ошибка при загрузке на ImgBB: {e}")
+        logger.error("Сетевая ошибка при загрузке на ImgBB: %s", e)
         return None
     except Exception as e:
-        logger.error(f"Неизвестная ошибка при загрузке изображения на ImgBB: {e}", exc_info=True)
+        logger.error("Неизвестная ошибка при загрузке изображения на ImgBB: %s", e, exc_info=True)
         return None
\ No newline at end of file
@@ -0,0 +1,147 @@
+# src/services/maintenance.py
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+
+import config
+from database import engine
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class MaintenanceTask:
+    name: str
+    interval: float
+    func: object
+    # Тяжелые задачи (ANALYZE, vacuum) запускаются только в окно низкой нагрузки
+    offpeak_only: bool = False
+    last_run: float | None = None
+
+
+# Остановка планировщика; на нем же ждут паузы внутри задач, чтобы остановка не ждала их конца
+_stop = threading.Event()
+
+# Последние запуски: (время, задача, длительность в секундах, метрики)
+history: deque = deque(maxlen=100)
+
+
+def _connect():
+    # PRAGMA выполняем вне транзакции, чтобы не держать блокировку дольше самой команды
+    return engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+
+
+def wal_checkpoint() -> dict:
+    """PASSIVE-чекпоинт не ждет читателей и писателей: переносит в БД то, что может."""
+    with _connect() as conn:
+        busy, log_frames, checkpointed = conn.exec_driver_sql("PRAGMA wal_checkpoint(PASSIVE)").one()
+    return {'busy': busy, 'wal_frames': log_frames, 'checkpointed': checkpointed}
+
+
+def optimize() -> dict:
+    with _connect() as conn:
+        conn.exec_driver_sql("PRAGMA optimize")
+    return {}
+
+
+def analyze() -> dict:
+    # analysis_limit ограничивает число строк, которые ANALYZE читает из каждого индекса
+    with _connect() as conn:
+        conn.exec_driver_sql(f"PRAGMA analysis_limit = {config.MAINTENANCE_ANALYSIS_LIMIT}")
+        conn.exec_driver_sql("ANALYZE")
+    return {}
+
+
+def incremental_vacuum() -> dict:
+    """
+    Возвращает свободные страницы файлу небольшими шагами с паузами между ними.
+    Работает только при auto_vacuum = INCREMENTAL (включается в database.configure_storage).
+    """
+    with _connect() as conn:
+        if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 2:
+            return {'pages_reclaimed': 0, 'skipped': 'auto_vacuum != INCREMENTAL'}
+
+        before = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+        remaining = before
+        raw = conn.connection.driver_connection
+        while remaining > 0 and before - remaining < config.MAINTENANCE_VACUUM_MAX_PAGES:
+            step = min(config.MAINTENANCE_VACUUM_STEP_PAGES, config.MAINTENANCE_VACUUM_MAX_PAGES - (before - remaining))
+            # pysqlite делает один шаг выражения, а incremental_vacuum освобождает по странице
+            # на шаг; executescript прогоняет выражение до конца — освобождаются все step страниц
+            raw.executescript(f"PRAGMA incremental_vacuum({step})")
+            remaining = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+            if _stop.wait(config.MAINTENANCE_VACUUM_PAUSE):
+                break
+    return {'pages_reclaimed': before - remaining, 'free_pages_left': remaining}
+
+
+def cleanup_stale_data() -> dict:
+    """Удаляет резервы и счетчики популярности, оставшиеся от удаленных товаров."""
+    with _connect() as conn:
+        reservations = conn.exec_driver_sql(
+            "DELETE FROM reservations WHERE variant_id NOT IN (SELECT id FROM product_variants)")
+        stats = conn.exec_driver_sql(
+            "DELETE FROM product_stats WHERE product_id NOT IN (SELECT id FROM products)")
+    return {'orphan_reservations': reservations.rowcount, 'orphan_product_stats': stats.rowcount}
+
+
+TASKS = [
+    MaintenanceTask('wal_checkpoint', config.MAINTENANCE_CHECKPOINT_INTERVAL, wal_checkpoint),
+    MaintenanceTask('optimize', config.MAINTENANCE_OPTIMIZE_INTERVAL, optimize),
+    MaintenanceTask('cleanup_stale_data', config.MAINTENANCE_CLEANUP_INTERVAL, cleanup_stale_data),
+    MaintenanceTask('analyze', config.MAINTENANCE_ANALYZE_INTERVAL, analyze, offpeak_only=True),
+    MaintenanceTask('incremental_vacuum', config.MAINTENANCE_VACUUM_INTERVAL, incremental_vacuum, offpeak_only=True),
+]
+
+
+def _is_offpeak(now: datetime) -> bool:
+    start, end = config.MAINTENANCE_OFFPEAK_HOURS
+    if start <= end:
+        return start <= now.hour < end
+    # Окно через полночь, например 23-5
+    return now.hour >= start or now.hour < end
+
+
+def run_due_tasks() -> None:
+    now = time.monotonic()
+    offpeak = _is_offpeak(datetime.now())
+    for task in TASKS:
+        if task.offpeak_only and not offpeak:
+            continue
+        if task.last_run is not None and now - task.last_run < task.interval:
+            continue
+        started = time.perf_counter()
+        try:
+            metrics = task.func()
+        except Exception as e:
+            logger.error("Ошибка задачи обслуживания БД %s: %s", task.name, e, exc_info=True)
+            metrics = {'error': str(e)}
+        duration = time.perf_counter() - started
+        task.last_run = time.monotonic()
+        history.append((datetime.now(), task.name, duration, metrics))
+        logger.info("Обслуживание БД: %s за %.0f мс %s", task.name, duration * 1000, metrics)
+
+
+def run_maintenance():
+    """Цикл планировщика обслуживания; завершается, когда выставлен _stop."""
+    # Частые задачи — не сразу после старта, чтобы не мешать подъему ботов.
+    # Задачи окна низкой нагрузки запускаются в первое же окно: иначе при регулярных
+    # деплоях (перезапуск чаще раза в сутки) они не выполнялись бы никогда.
+    for task in TASKS:
+        if not task.offpeak_only:
+            task.last_run = time.monotonic()
+    while not _stop.wait(config.MAINTENANCE_TICK):
+        run_due_tasks()
+
+
+def start_maintenance_thread() -> tuple[threading.Thread, threading.Event]:
+    thread = threading.Thread(target=run_maintenance, name="DbMaintenanceThread")
+    thread.daemon = True
+    thread.start()
+    # При штатной остановке прерываем паузы vacuum, не дожидаясь конца прохода
+    atexit.register(_stop.set)
+    return thread, _stop
@@ -0,0 +1,64 @@
+# src/services/notifier.py
+import asyncio
+import logging
+
+from telegram import Bot
+from telegram.error import RetryAfter, TelegramError
+
+logger = logging.getLogger(__name__)
+
+
+class CustomerNotifier:
+    """
+    Фоновая очередь уведомлений покупателям. Сообщения отправляются от имени
+    клиентского бота (админ-бот не может писать тем, кто его не запускал)
+    не чаще NOTIFY_RATE_PER_SECOND, поэтому массовая смена статусов
+    не упирается в лимиты Bot API и не держит обработчик админа.
+    """
+
+    def __init__(self, token: str, rate_per_second: float):
+        self._bot = Bot(token)
+        self._interval = 1 / rate_per_second
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        await self._bot.initialize()
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run(), name="CustomerNotifier")
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        await self._bot.shutdown()
+
+    def enqueue(self, chat_id: int, text: str) -> None:
+        self._queue.put_nowait((chat_id, text))
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _run(self) -> None:
+        while True:
+            chat_id, text = await self._queue.get()
+            try:
+                await self._send(chat_id, text)
+            finally:
+                self._queue.task_done()
+            await asyncio.sleep(self._interval)
+
+    async def _send(self, chat_id: int, text: str) -> None:
+        try:
+            await self._bot.send_message(chat_id=chat_id, text=text, parse_mode='HTML')
+        except RetryAfter as e:
+            logger.warning("Bot API попросил подождать %s сек. перед уведомлением %s", e.retry_after, chat_id)
+            await asyncio.sleep(e.retry_after)
+            await self._send(chat_id, text)
+        except TelegramError as e:
+            # Пользователь мог заблокировать бота — это не повод останавливать очередь
+            logger.warning("Не удалось уведомить пользователя %s: %s", chat_id, e)
@@ -3,6 +3,7 @@ import logging
 from sqlalchemy.orm import Session
 from database import queries
 from database.models import User, Order
+from services import catalog_snapshot
 
 logger = logging.getLogger(__name__)
 
@@ -14,13 +15,14 @@ def process_new_order(db: Session, user: User, order_data: dict) -> Order | None
     try:
         # Транзакция будет либо выполнена полностью, либо отменена благодаря SQLAlchemy
         new_order = queries.create_order(db, user, order_data)
-        logger.info(f"Успешно обработан и сохранен заказ #{new_order.id} для пользователя {user.telegram_id}")
+        logger.info("Успешно обработан и сохранен заказ #%s для пользователя %s", new_order.id, user.telegram_id)
+        catalog_snapshot.request_publish()
         return new_order
     except ValueError as e:
-        logger.warning(f"Ошибка при обработке заказа для {user.telegram_id}: {e}")
+        logger.warning("Ошибка при обработке заказа для %s: %s", user.telegram_id, e)
         db.rollback() # Откатываем изменения в сессии
         return None
     except Exception as e:
-        logger.error(f"Критическая ошибка при обработке заказа: {e}", exc_info=True)
+        logger.error("Критическая ошибка при обработке заказа: %s", e, exc_info=True)
         db.rollback()
         return None
\ No newline at end of file
@@ -0,0 +1,120 @@
+# src/services/popularity.py
+"""
+Счетчики популярности товаров. Просмотры и добавления в корзину копятся в памяти
+процесса и раз в POPULARITY_FLUSH_INTERVAL сбрасываются в product_stats одним UPSERT,
+поэтому чтение карточки товара не превращается в запись в SQLite.
+
+Рейтинг затухает с периодом полураспада POPULARITY_HALF_LIFE_HOURS. Вместо того чтобы
+уменьшать все счета со временем, новые события получают вес 2**(t / период) от
+фиксированной эпохи (forward decay); счет хранится как log2 этой суммы. Порядок товаров
+по такому счету совпадает с порядком по затухающему рейтингу, а пересчитывать
+приходится только строки товаров, у которых были события.
+"""
+import atexit
+import logging
+import math
+import threading
+from collections import Counter
+from datetime import datetime
+
+import config
+from database import SessionLocal, queries
+from services import catalog_snapshot
+
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(2024, 1, 1)
+
+_lock = threading.Lock()
+_views: Counter = Counter()  # product_id -> просмотры
+_carts: Counter = Counter()  # variant_id -> добавления в корзину
+
+_flusher_lock = threading.Lock()
+_flusher_stop = threading.Event()
+_flusher_thread = None
+
+
+def record_view(product_id: int) -> None:
+    with _lock:
+        _views[product_id] += 1
+    _ensure_flusher()
+
+
+def record_cart(variant_id: int) -> None:
+    with _lock:
+        _carts[variant_id] += 1
+    _ensure_flusher()
+
+
+def score_increment(views: int, carts: int, now: datetime) -> float | None:
+    """Прирост счета (в log2) от событий в момент now; None, если прибавлять нечего."""
+    weight = views * config.POPULARITY_VIEW_WEIGHT + carts * config.POPULARITY_CART_WEIGHT
+    if weight <= 0:
+        return None
+    half_lives = (now - _EPOCH).total_seconds() / (config.POPULARITY_HALF_LIFE_HOURS * 3600)
+    return half_lives + math.log2(weight)
+
+
+def flush() -> int:
+    """Записывает накопленные счетчики в БД. Возвращает число обновленных товаров."""
+    with _lock:
+        views, carts = _views.copy(), _carts.copy()
+        _views.clear()
+        _carts.clear()
+    if not views and not carts:
+        return 0
+
+    db = SessionLocal()
+    try:
+        variant_products = queries.get_variant_product_ids(db, list(carts))
+        per_product = {product_id: [count, 0] for product_id, count in views.items()}
+        for variant_id, count in carts.items():
+            product_id = variant_products.get(variant_id)
+            if product_id is not None:
+                per_product.setdefault(product_id, [0, 0])[1] += count
+
+        now = datetime.utcnow()
+        stats = {}
+        for product_id, (view_count, cart_count) in per_product.items():
+            increment = score_increment(view_count, cart_count, now)
+            if increment is not None:
+                stats[product_id] = (view_count, cart_count, increment)
+        written = queries.add_product_stats(db, stats, now) if stats else 0
+    except Exception as e:
+        logger.error("Ошибка записи счетчиков популярности: %s", e, exc_info=True)
+        db.rollback()
+        # Возвращаем счетчики, чтобы учесть их при следующей попытке
+        with _lock:
+            _views.update(views)
+            _carts.update(carts)
+        return 0
+    finally:
+        db.close()
+
+    if written:
+        # Рейтинг изменился — пересобираем снимок каталога, упорядоченный по популярности
+        catalog_snapshot.request_publish()
+    return written
+
+
+def _flusher_loop():
+    # Ждем на Event, а не в time.sleep: для /profile это простой, а не работа
+    while not _flusher_stop.wait(config.POPULARITY_FLUSH_INTERVAL):
+        flush()
+
+
+def _shutdown() -> None:
+    _flusher_stop.set()
+    flush()
+
+
+def _ensure_flusher() -> None:
+    global _flusher_thread
+    if _flusher_thread is not None:
+        return
+    with _flusher_lock:
+        if _flusher_thread is None:
+            _flusher_thread = threading.Thread(target=_flusher_loop, name="PopularityFlushThread", daemon=True)
+            _flusher_thread.start()
+            # Не теряем последние счетчики при штатной остановке воркера
+            atexit.register(_shutdown)
@@ -0,0 +1,44 @@
+# src/services/reservation_sweeper.py
+import logging
+import threading
+
+import config
+from database import SessionLocal, queries
+from services import catalog_snapshot
+
+logger = logging.getLogger(__name__)
+
+
+def sweep_expired_reservations() -> int:
+    """Удаляет все истекшие резервы пачками, чтобы не держать долгую блокировку записи."""
+    total = 0
+    db = SessionLocal()
+    try:
+        while True:
+            released = queries.release_expired_reservations(db, config.RESERVATION_SWEEP_BATCH)
+            total += released
+            if released < config.RESERVATION_SWEEP_BATCH:
+                break
+    except Exception as e:
+        logger.error("Ошибка очистки истекших резервов: %s", e, exc_info=True)
+        db.rollback()
+    finally:
+        db.close()
+    return total
+
+
+def run_sweeper(stop_event: threading.Event):
+    """Цикл фоновой очистки резервов; завершается, когда выставлен stop_event."""
+    while not stop_event.wait(config.RESERVATION_SWEEP_INTERVAL):
+        released = sweep_expired_reservations()
+        if released:
+            logger.info("Снято истекших резервов: %s", released)
+            catalog_snapshot.request_publish()
+
+
+def start_sweeper_thread() -> tuple[threading.Thread, threading.Event]:
+    stop_event = threading.Event()
+    thread = threading.Thread(target=run_sweeper, args=(stop_event,), name="ReservationSweeperThread")
+    thread.daemon = True
+    thread.start()
+    return thread, stop_event
@@ -0,0 +1,215 @@
+# src/services/watchdog.py
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+from sqlalchemy import text
+
+import config
+from database import engine
+from utils import rate_limit
+from utils.logging_setup import current_bot
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BotState:
+    name: str
+    creator: Callable
+    thread_name: str
+    thread: threading.Thread | None = None
+    application: object = None
+    started_at: float | None = None
+    last_update_at: float | None = None
+    last_poll_at: float | None = None
+    # Задержки планировщика цикла событий за последнюю минуту (в секундах)
+    lags: deque = field(default_factory=lambda: deque(maxlen=60))
+    restarts: int = 0
+    failures_in_row: int = 0
+    next_restart_at: float | None = None
+
+    def report(self, now: float) -> dict:
+        updater = getattr(self.application, 'updater', None)
+        return {
+            'alive': self.thread is not None and self.thread.is_alive(),
+            'polling': bool(updater is not None and updater.running),
+            'uptime_s': round(now - self.started_at, 1) if self.started_at else None,
+            'loop_lag_ms': round(self.lags[-1] * 1000, 1) if self.lags else None,
+            'loop_lag_max_ms': round(max(self.lags) * 1000, 1) if self.lags else None,
+            'since_last_update_s': round(now - self.last_update_at, 1) if self.last_update_at else None,
+            'since_last_poll_s': round(now - self.last_poll_at, 1) if self.last_poll_at else None,
+            'restarts': self.restarts,
+        }
+
+    def healthy(self, now: float) -> bool:
+        if self.thread is None or not self.thread.is_alive():
+            return False
+        if self.last_poll_at is None or now - self.last_poll_at > config.WATCHDOG_POLL_STALE:
+            return False
+        return not self.lags or self.lags[-1] < config.WATCHDOG_MAX_LOOP_LAG
+
+
+bots: dict[str, BotState] = {}
+
+
+# ==================== Сигналы из ботов ====================
+def record_update() -> None:
+    """Вызывается при обработке каждого апдейта (в потоке бота)."""
+    state = bots.get(current_bot.get())
+    if state is not None:
+        state.last_update_at = time.time()
+
+
+def record_poll() -> None:
+    """Вызывается после каждого успешного getUpdates: признак живого polling."""
+    state = bots.get(current_bot.get())
+    if state is not None:
+        state.last_poll_at = time.time()
+
+
+async def _measure_loop_lag(state: BotState) -> None:
+    """На сколько позже запланированного просыпается корутина — столько цикл был занят."""
+    loop = asyncio.get_running_loop()
+    interval = config.WATCHDOG_LAG_INTERVAL
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(loop.time() - started - interval, 0.0)
+        state.lags.append(lag)
+        if lag >= config.WATCHDOG_MAX_LOOP_LAG:
+            logger.warning("Цикл событий %s был заблокирован на %.0f мс", state.name, lag * 1000)
+
+
+# ==================== Запуск и перезапуск ботов ====================
+def _run_bot(state: BotState) -> None:
+    """Запускает бота в новом цикле событий (в своем потоке)."""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    # Все записи из этого потока и его задач помечаются именем бота
+    current_bot.set(state.name)
+    lag_task = loop.create_task(_measure_loop_lag(state))
+
+    try:
+        logger.info("Запуск %s...", state.name)
+        state.application = state.creator()
+        state.started_at = time.time()
+        # Без обработки сигналов, чтобы избежать ошибки 'set_wakeup_fd' вне главного потока
+        state.application.run_polling(stop_signals=None, close_loop=False)
+    except Exception as e:
+        logger.error("Критическая ошибка в потоке %s: %s", state.name, e, exc_info=True)
+    finally:
+        lag_task.cancel()
+        try:
+            loop.run_until_complete(asyncio.gather(lag_task, return_exceptions=True))
+        finally:
+            loop.close()
+
+
+def register_bot(name: str, creator: Callable, thread_name: str) -> BotState:
+    state = BotState(name=name, creator=creator, thread_name=thread_name)
+    bots[name] = state
+    return state
+
+
+def _start(state: BotState) -> None:
+    state.thread = threading.Thread(target=_run_bot, args=(state,), name=state.thread_name, daemon=True)
+    state.thread.start()
+
+
+def start_bots() -> None:
+    for state in bots.values():
+        _start(state)
+
+
+def supervise(stop_event: threading.Event) -> None:
+    """
+    Следит за потоками ботов и перезапускает упавшие с экспоненциальной задержкой.
+    Счетчик неудач сбрасывается, если бот проработал дольше WATCHDOG_STABLE_UPTIME.
+    """
+    while not stop_event.wait(1):
+        now = time.monotonic()
+        for state in bots.values():
+            if state.thread is not None and state.thread.is_alive():
+                continue
+
+            if state.next_restart_at is None:
+                uptime = time.time() - state.started_at if state.started_at else 0
+                if uptime >= config.WATCHDOG_STABLE_UPTIME:
+                    state.failures_in_row = 0
+                delay = min(config.WATCHDOG_BACKOFF_BASE * 2 ** state.failures_in_row, config.WATCHDOG_BACKOFF_MAX)
+                state.failures_in_row += 1
+                state.next_restart_at = now + delay
+                logger.warning("Поток %s завершился, перезапуск через %.0f сек.", state.name, delay)
+            elif now >= state.next_restart_at:
+                state.next_restart_at = None
+                state.restarts += 1
+                state.application = None
+                state.last_poll_at = None
+                _start(state)
+
+
+# ==================== Отчет о здоровье ====================
+def check_database() -> dict:
+    started = time.perf_counter()
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return {'ok': True, 'latency_ms': round((time.perf_counter() - started) * 1000, 1)}
+    except Exception as e:
+        return {'ok': False, 'error': str(e)}
+
+
+def health_report() -> tuple[bool, dict]:
+    """Сводка для /healthz: (все ли в порядке, подробности)."""
+    now = time.time()
+    database = check_database()
+    healthy = database['ok'] and all(state.healthy(now) for state in bots.values())
+    report = {
+        'status': 'ok' if healthy else 'degraded',
+        'database': database,
+        'bots': {name: state.report(now) for name, state in bots.items()},
+        # Счетчики лимитеров живут в памяти процесса: web:* видны только в отчете веб-приложения
+        'rate_limits': rate_limit.get_stats(),
+    }
+    return healthy, report
+
+
+class _HealthHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/healthz':
+            self.send_error(404)
+            return
+        healthy, report = health_report()
+        body = json.dumps(report, ensure_ascii=False).encode('utf-8')
+        self.send_response(200 if healthy else 503)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Пробы здоровья приходят часто — в общий лог их не пишем
+        pass
+
+
+def start_health_server() -> ThreadingHTTPServer | None:
+    """HTTP /healthz для процесса ботов (веб-приложение отдает тот же отчет своим маршрутом)."""
+    if not config.HEALTH_PORT:
+        return None
+    try:
+        server = ThreadingHTTPServer((config.HEALTH_HOST, config.HEALTH_PORT), _HealthHandler)
+    except OSError as e:
+        # Занятый порт не должен мешать запуску ботов
+        logger.error("Не удалось запустить /healthz на %s:%s: %s", config.HEALTH_HOST, config.HEALTH_PORT, e)
+        return None
+    thread = threading.Thread(target=server.serve_forever, name="HealthServerThread", daemon=True)
+    thread.start()
+    logger.info("Проверка здоровья доступна на http://%s:%s/healthz", config.HEALTH_HOST, config.HEALTH_PORT)
+    return server
@@ -0,0 +1,39 @@
+# src/utils/launch_token.py
+"""
+Подписанный токен запуска Mini App. Магазин открывается кнопкой web_app обычной
+клавиатуры (только так работает sendData), а в этом режиме Telegram не передает
+initData. Поэтому бот сам подписывает telegram_id в ссылке на магазин, а веб-сервер
+проверяет подпись тем же токеном бота.
+"""
+import hashlib
+import hmac
+import time
+
+import config
+
+
+def _signature(telegram_id: int, issued_at: int) -> str:
+    secret_key = hmac.new(b'WebAppLaunch', config.TOKEN.encode(), hashlib.sha256).digest()
+    return hmac.new(secret_key, f"{telegram_id}.{issued_at}".encode(), hashlib.sha256).hexdigest()
+
+
+def sign(telegram_id: int) -> str:
+    """Токен вида "<telegram_id>.<время выдачи>.<подпись>" для ссылки на магазин."""
+    issued_at = int(time.time())
+    return f"{telegram_id}.{issued_at}.{_signature(telegram_id, issued_at)}"
+
+
+def verify(token: str) -> int | None:
+    """telegram_id из токена; None — если подпись неверна или старше WEBAPP_AUTH_MAX_AGE."""
+    if not token or not config.TOKEN:
+        return None
+    try:
+        telegram_id, issued_at, received = token.split('.')
+        telegram_id, issued_at = int(telegram_id), int(issued_at)
+    except ValueError:
+        return None
+    if not hmac.compare_digest(_signature(telegram_id, issued_at), received):
+        return None
+    if time.time() - issued_at > config.WEBAPP_AUTH_MAX_AGE:
+        return None
+    return telegram_id
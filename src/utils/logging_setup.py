@@ -0,0 +1,110 @@
+# src/utils/logging_setup.py
+import atexit
+import contextvars
+import json
+import logging
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+import config
+
+# Контекст текущего бота и апдейта; наследуется задачами asyncio своего цикла событий
+current_bot = contextvars.ContextVar('current_bot', default=None)
+current_update_id = contextvars.ContextVar('current_update_id', default=None)
+
+_listener: QueueListener | None = None
+
+
+class ContextFilter(logging.Filter):
+    """Добавляет к записи имя бота и id апдейта. Работает в потоке, который логирует."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.bot = current_bot.get()
+        record.update_id = current_update_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Пропускает лишь долю записей ниже WARNING от шумных логгеров (LOG_SAMPLING).
+    Отброшенные записи даже не попадают в очередь.
+    """
+
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        # Длинные префиксы проверяем первыми: 'telegram.ext' точнее, чем 'telegram'
+        self.rates = sorted(rates.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        for prefix, rate in self.rates:
+            if record.name == prefix or record.name.startswith(prefix + '.'):
+                return random.random() < rate
+        return True
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    Кладет запись в очередь как есть: сообщение форматируется уже в потоке
+    QueueListener, а не в обработчике апдейта или запроса Flask.
+    (Стандартный QueueHandler форматирует запись в момент вызова.)
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName,
+            'bot': getattr(record, 'bot', None),
+            'update_id': getattr(record, 'update_id', None),
+        }
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def setup_logging() -> None:
+    """
+    Настраивает корневой логгер: обработчики лишь кладут записи в очередь,
+    а форматирование и запись в stderr идут в отдельном потоке QueueListener.
+    Повторный вызов ничего не делает.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    if config.LOG_FORMAT == 'json':
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - [%(bot)s/%(update_id)s] %(message)s'))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = LazyQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(config.LOG_SAMPLING))
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(config.LOG_LEVEL)
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+async def bind_update_context(update, context) -> None:
+    """Обработчик PTB (группа -1): запоминает id текущего апдейта для логов."""
+    current_update_id.set(update.update_id)
@@ -0,0 +1,104 @@
+# src/utils/profiler.py
+"""
+Сэмплирующий профилировщик всего процесса: раз в PROFILE_INTERVAL снимает стеки
+всех потоков через sys._current_frames(). Профилируемый код не инструментируется,
+поэтому накладные расходы ограничены самим сэмплирующим потоком.
+
+Результат — стеки в collapsed-формате (flamegraph.pl, speedscope, inferno)
+и сводка самых горячих функций.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+# Ожидание ввода-вывода и событий: такие выборки в сводку горячих функций не попадают.
+# Блокирующий вызов C (select, SimpleQueue.get) в стеке не виден, поэтому простой
+# узнается по последнему Python-кадру перед ним.
+IDLE_LEAVES = {
+    'selectors.py:select',
+    'threading.py:wait',
+    'handlers.py:dequeue',      # QueueListener логов и трасс ждет записей
+    'thread.py:_worker',        # свободный поток ThreadPoolExecutor (asyncio.to_thread)
+    'socketserver.py:serve_forever',
+}
+
+_lock = threading.Lock()
+
+
+@dataclass
+class Profile:
+    seconds: float = 0.0
+    samples: int = 0
+    # Стек вида "поток;функция;...;функция" -> число выборок
+    stacks: Counter = field(default_factory=Counter)
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    def top(self, limit: int) -> tuple[int, list[tuple[str, int, int]]]:
+        """(активных выборок, [(функция, собственных, включая вложенные)]) без выборок простоя."""
+        own, total = Counter(), Counter()
+        busy = 0
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')[1:]
+            if not frames or _short(frames[-1]) in IDLE_LEAVES:
+                continue
+            busy += count
+            own[frames[-1]] += count
+            # Рекурсивная функция в одном стеке считается один раз
+            for frame in set(frames):
+                total[frame] += count
+        return busy, [(name, count, total[name]) for name, count in own.most_common(limit)]
+
+
+def _short(label: str) -> str:
+    # "select (selectors.py:451)" -> "selectors.py:select"
+    name, _, location = label.partition(' (')
+    return f"{location.split(':', 1)[0]}:{name}"
+
+
+_labels: dict = {}
+
+
+def _label(code) -> str:
+    # Подпись кадра кэшируется по объекту кода: на каждой выборке нет форматирования строк
+    label = _labels.get(code)
+    if label is None:
+        label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        _labels[code] = label
+    return label
+
+
+def sample(seconds: float, interval: float) -> Profile:
+    """
+    Снимает стеки всех потоков (кроме своего) в течение seconds.
+    Блокирует вызывающий поток; из цикла событий вызывать через asyncio.to_thread.
+    Одновременно может работать только один профиль — иначе RuntimeError.
+    """
+    if not _lock.acquire(blocking=False):
+        raise RuntimeError("Профилирование уже запущено")
+    try:
+        profile = Profile()
+        own_id = threading.get_ident()
+        started = time.perf_counter()
+        deadline = started + seconds
+        while time.perf_counter() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                profile.stacks[';'.join(reversed(stack))] += 1
+            profile.samples += 1
+            time.sleep(interval)
+        profile.seconds = time.perf_counter() - started
+        return profile
+    finally:
+        _lock.release()
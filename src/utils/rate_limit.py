@@ -0,0 +1,102 @@
+# src/utils/rate_limit.py
+import logging
+import math
+import threading
+import time
+from functools import wraps
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Раз в столько вызовов выбрасываем корзины, которые давно не трогали (они все равно полные)
+_CLEANUP_EVERY = 1000
+
+
+class TokenBucketLimiter:
+    """
+    Token bucket в памяти процесса: на каждый ключ (telegram_id или IP) —
+    capacity запросов, которые восполняются за period секунд.
+    """
+
+    def __init__(self, name: str, capacity: int, period: float):
+        self.name = name
+        self.capacity = capacity
+        self.period = period
+        self.rate = capacity / period
+        self.allowed = 0
+        self.throttled = 0
+        self._buckets: dict[object, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    def hit(self, key) -> float:
+        """Списывает токен. Возвращает 0, если запрос разрешен, иначе — сколько секунд подождать."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - last) * self.rate)
+
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                self.allowed += 1
+                retry_after = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                self.throttled += 1
+                retry_after = (1 - tokens) / self.rate
+
+            self._calls += 1
+            if self._calls % _CLEANUP_EVERY == 0:
+                self._buckets = {k: v for k, v in self._buckets.items() if now - v[1] < self.period}
+        return retry_after
+
+
+_limiters: dict[str, TokenBucketLimiter] = {}
+_registry_lock = threading.Lock()
+
+
+def get_limiter(name: str) -> TokenBucketLimiter | None:
+    """Лимитер по имени из config.RATE_LIMITS; None, если для имени лимит не задан."""
+    limiter = _limiters.get(name)
+    if limiter is not None:
+        return limiter
+    if name not in config.RATE_LIMITS:
+        return None
+    with _registry_lock:
+        if name not in _limiters:
+            capacity, period = config.RATE_LIMITS[name]
+            _limiters[name] = TokenBucketLimiter(name, capacity, period)
+        return _limiters[name]
+
+
+def get_stats() -> dict[str, dict[str, int]]:
+    """Счетчики разрешенных и отброшенных запросов по каждому лимитеру."""
+    return {name: {'allowed': limiter.allowed, 'throttled': limiter.throttled}
+            for name, limiter in sorted(_limiters.items())}
+
+
+def rate_limited(name: str, notify: bool = False):
+    """
+    Декоратор для обработчиков PTB: отбрасывает апдейт до открытия сессии БД,
+    если пользователь превысил лимит `name`. С notify=True пользователю сообщается,
+    через сколько повторить.
+    """
+    def decorator(func):
+        @wraps(func)
+        async def wrapped(update, context, *args, **kwargs):
+            limiter = get_limiter(name)
+            user = update.effective_user
+            if limiter is not None and user is not None:
+                retry_after = limiter.hit(user.id)
+                if retry_after:
+                    logger.debug("Лимит %s превышен пользователем %s", name, user.id)
+                    if notify and update.effective_message:
+                        await update.effective_message.reply_text(
+                            f"Слишком много запросов. Попробуйте через {math.ceil(retry_after)} сек.")
+                    return None
+            return await func(update, context, *args, **kwargs)
+
+        return wrapped
+
+    return decorator
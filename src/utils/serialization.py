@@ -0,0 +1,15 @@
+# src/utils/serialization.py
+import json
+
+# orjson необязателен: без него работаем на stdlib
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(obj) -> bytes:
+    """Сериализует объект в JSON-байты (orjson, если установлен)."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
@@ -0,0 +1,31 @@
+# src/utils/startup.py
+import logging
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class StartupProfiler:
+    """Замеряет фазы холодного старта (импорты, инициализация БД и т.д.) и печатает разбивку."""
+
+    def __init__(self):
+        self._started = time.perf_counter()
+        self.phases: list[tuple[str, float]] = []
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def report(self) -> None:
+        total = time.perf_counter() - self._started
+        lines = [f"  {name:<40} {duration * 1000:8.1f} мс" for name, duration in self.phases]
+        details = "\n".join(lines)
+        logger.info("Холодный старт за %.1f мс:\n%s", total * 1000, details)
+
+
+startup = StartupProfiler()
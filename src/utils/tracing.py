@@ -0,0 +1,221 @@
+# src/utils/tracing.py
+"""
+Легковесная трассировка: у каждого апдейта Telegram и запроса Flask свой trace id,
+внутри — вложенные span'ы (queries.*, SQL, ImgBB, Bot API). Завершенные трассы
+пишутся в ротируемый файл в формате Zipkin v2 JSON (одна трасса — одна строка).
+Медленные трассы сохраняются всегда, остальные — с вероятностью TRACE_SAMPLE_RATE.
+"""
+import atexit
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import random
+import time
+from contextlib import contextmanager
+from logging.handlers import QueueListener, RotatingFileHandler
+
+import config
+from utils.logging_setup import LazyQueueHandler, current_bot
+
+_current_trace = contextvars.ContextVar('current_trace', default=None)
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+_export_logger = logging.getLogger('tracing.export')
+_listener: QueueListener | None = None
+
+
+class Span:
+    __slots__ = ('name', 'span_id', 'parent_id', 'timestamp_us', 'started_ns', 'duration_us', 'tags')
+
+    def __init__(self, name: str, parent_id: str | None, tags: dict):
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.timestamp_us = time.time_ns() // 1000
+        self.started_ns = time.perf_counter_ns()
+        self.duration_us = 0
+        self.tags = tags
+
+
+class Trace:
+    __slots__ = ('trace_id', 'service', 'root', 'spans', 'dropped')
+
+    def __init__(self):
+        self.trace_id = os.urandom(16).hex()
+        self.service = current_bot.get() or 'webapp'
+        # Корневой span хранится отдельно: лимит TRACE_MAX_SPANS на него не действует
+        self.root: Span | None = None
+        self.spans: list[Span] = []
+        self.dropped = 0
+
+
+def start_span(name: str, **tags):
+    """Открывает span в текущей трассе. Вне трассы возвращает None и ничего не стоит."""
+    trace = _current_trace.get()
+    if trace is None:
+        return None
+    span = Span(name, _current_span.get(), tags)
+    return span, _current_span.set(span.span_id)
+
+
+def end_span(handle, error: BaseException | None = None) -> None:
+    if handle is None:
+        return
+    span, token = handle
+    span.duration_us = (time.perf_counter_ns() - span.started_ns) // 1000
+    if error is not None:
+        span.tags['error'] = repr(error)
+    _current_span.reset(token)
+
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    if span.parent_id is None:
+        trace.root = span
+    elif len(trace.spans) < config.TRACE_MAX_SPANS:
+        trace.spans.append(span)
+    else:
+        trace.dropped += 1
+
+
+@contextmanager
+def span(name: str, **tags):
+    handle = start_span(name, **tags)
+    try:
+        yield
+    except BaseException as e:
+        end_span(handle, e)
+        raise
+    end_span(handle)
+
+
+@contextmanager
+def trace(name: str, **tags):
+    """Корневой span новой трассы (апдейт или HTTP-запрос)."""
+    token = _current_trace.set(Trace())
+    try:
+        with span(name, **tags):
+            yield
+    finally:
+        finished = _current_trace.get()
+        _current_trace.reset(token)
+        _export(finished)
+
+
+def traced(name: str):
+    """Декоратор: оборачивает вызов функции (синхронной или async) в span."""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapped(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapped
+
+        @functools.wraps(func)
+        def wrapped(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapped
+
+    return decorator
+
+
+def _export(trace: Trace) -> None:
+    root = trace.root
+    if _listener is None or root is None:
+        return
+    slow = root.duration_us >= config.TRACE_SLOW_MS * 1000
+    if random.random() >= (config.TRACE_SLOW_SAMPLE_RATE if slow else config.TRACE_SAMPLE_RATE):
+        return
+
+    spans = []
+    for s in trace.spans + [root]:
+        entry = {
+            'traceId': trace.trace_id, 'id': s.span_id, 'name': s.name,
+            'timestamp': s.timestamp_us, 'duration': s.duration_us,
+            'localEndpoint': {'serviceName': trace.service},
+            'tags': {key: str(value) for key, value in s.tags.items()},
+        }
+        if s.parent_id:
+            entry['parentId'] = s.parent_id
+        spans.append(entry)
+    if trace.dropped:
+        spans[-1]['tags']['dropped_spans'] = str(trace.dropped)
+    # Сериализация и запись на диск — в потоке QueueListener
+    _export_logger.info('%s', _LazyJson(spans))
+
+
+class _LazyJson:
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return json.dumps(self.value, ensure_ascii=False)
+
+
+# ==================== Интеграции ====================
+def _instrument_sqlalchemy() -> None:
+    from sqlalchemy import event
+    from database import engine
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._trace_span = start_span('sql', statement=statement[:300])
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        end_span(getattr(context, '_trace_span', None))
+
+    @event.listens_for(engine, 'handle_error')
+    def handle_error(exception_context):
+        context = exception_context.execution_context
+        if context is not None:
+            end_span(getattr(context, '_trace_span', None), exception_context.original_exception)
+
+
+def init_flask_tracing(app) -> None:
+    from flask import g, request
+
+    @app.before_request
+    def start_request_trace():
+        g.trace_cm = trace('http.request', method=request.method, path=request.path)
+        g.trace_cm.__enter__()
+
+    @app.teardown_request
+    def finish_request_trace(error=None):
+        trace_cm = g.pop('trace_cm', None)
+        if trace_cm is not None:
+            if error is not None:
+                trace_cm.__exit__(type(error), error, error.__traceback__)
+            else:
+                trace_cm.__exit__(None, None, None)
+
+
+def setup_tracing() -> None:
+    """Подключает экспорт трасс в файл и span'ы SQL. Повторный вызов ничего не делает."""
+    global _listener
+    if _listener is not None:
+        return
+
+    config.TRACE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    file_handler = RotatingFileHandler(config.TRACE_FILE, maxBytes=config.TRACE_FILE_MAX_BYTES,
+                                       backupCount=config.TRACE_FILE_BACKUPS, encoding='utf-8')
+    file_handler.setFormatter(logging.Formatter('%(message)s'))
+
+    trace_queue = queue.SimpleQueue()
+    _export_logger.handlers[:] = [LazyQueueHandler(trace_queue)]
+    _export_logger.setLevel(logging.INFO)
+    _export_logger.propagate = False
+
+    _listener = QueueListener(trace_queue, file_handler)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    _instrument_sqlalchemy()
@@ -1,7 +1,9 @@
 # src/webapp/__init__.py
 from flask import Flask
-from config import FLASK_SECRET_KEY
-import logging
+from werkzeug.middleware.proxy_fix import ProxyFix
+from config import FLASK_SECRET_KEY, WEBAPP_PROXY_HOPS
+from utils.logging_setup import setup_logging
+from utils.tracing import setup_tracing, init_flask_tracing
 
 
 def create_app():
@@ -10,7 +12,14 @@ def create_app():
     app.config.from_mapping(
         SECRET_KEY=FLASK_SECRET_KEY,
     )
-    logging.basicConfig(level=logging.INFO)
+    # За прокси remote_addr — адрес прокси; настоящий IP клиента берем из X-Forwarded-For
+    if WEBAPP_PROXY_HOPS:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=WEBAPP_PROXY_HOPS, x_proto=WEBAPP_PROXY_HOPS,
+                                x_host=WEBAPP_PROXY_HOPS)
+    # Логи пишутся через общую очередь и не задерживают обработку запросов
+    setup_logging()
+    setup_tracing()
+    init_flask_tracing(app)
 
     with app.app_context():
         from . import routes
@@ -0,0 +1,48 @@
+# src/webapp/auth.py
+import hashlib
+import hmac
+import json
+import time
+from urllib.parse import parse_qsl
+
+from flask import request
+
+import config
+from utils import launch_token
+
+
+def get_webapp_user_id() -> int | None:
+    """
+    Проверяет подпись initData Telegram Mini App из заголовка X-Telegram-Init-Data
+    и возвращает telegram_id пользователя. None — если подписи нет, она неверна
+    или устарела (auth_date старше WEBAPP_AUTH_MAX_AGE), чтобы утекшую initData
+    нельзя было использовать бесконечно.
+    Без initData (магазин открыт кнопкой обычной клавиатуры) проверяется токен
+    запуска из заголовка X-Webapp-Launch-Token, выданный ботом в /start.
+    """
+    init_data = request.headers.get('X-Telegram-Init-Data', '')
+    if not init_data:
+        return launch_token.verify(request.headers.get('X-Webapp-Launch-Token', ''))
+    if not config.TOKEN:
+        return None
+
+    fields = dict(parse_qsl(init_data, keep_blank_values=True))
+    received_hash = fields.pop('hash', '')
+    data_check_string = '\n'.join(f"{key}={value}" for key, value in sorted(fields.items()))
+
+    secret_key = hmac.new(b'WebAppData', config.TOKEN.encode(), hashlib.sha256).digest()
+    expected_hash = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(expected_hash, received_hash):
+        return None
+
+    try:
+        auth_date = int(fields['auth_date'])
+    except (KeyError, ValueError):
+        return None
+    if time.time() - auth_date > config.WEBAPP_AUTH_MAX_AGE:
+        return None
+
+    try:
+        return int(json.loads(fields['user'])['id'])
+    except (KeyError, ValueError, TypeError):
+        return None
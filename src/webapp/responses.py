@@ -0,0 +1,112 @@
+# src/webapp/responses.py
+import zlib
+from flask import Response, request
+
+import config
+from utils.serialization import dumps
+
+# brotli необязателен: если его нет, отдаем только gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+SNAPSHOT_CHUNK_SIZE = 64 * 1024
+
+
+def _negotiate_encoding() -> str | None:
+    """Выбирает сжатие по заголовку Accept-Encoding клиента."""
+    offers = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return request.accept_encodings.best_match(offers)
+
+
+def _compressor(encoding: str):
+    """Возвращает пару (process, finish) для потокового сжатия."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=5)
+        return compressor.process, compressor.finish
+    # wbits=31 — zlib-поток с gzip-заголовком
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    process, finish = _compressor(encoding)
+    return process(body) + finish()
+
+
+def json_response(payload, status: int = 200) -> Response:
+    """Собирает JSON-ответ и сжимает его, если он больше порога."""
+    body = dumps(payload)
+    encoding = _negotiate_encoding() if len(body) >= config.JSON_COMPRESS_MIN_SIZE else None
+    if encoding:
+        body = _compress(body, encoding)
+
+    response = Response(body, status=status, mimetype='application/json')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+
+def stream_json_list(items: list, status: int = 200) -> Response:
+    """
+    Отдает JSON-массив частями (chunked) вместо одной большой строки в памяти.
+    Небольшие списки отдаются обычным json_response.
+    """
+    if len(items) < config.JSON_STREAM_MIN_ITEMS:
+        return json_response(items, status)
+
+    # Выбираем сжатие здесь: генератор выполняется уже вне контекста запроса
+    encoding = _negotiate_encoding()
+    chunk_size = config.JSON_STREAM_CHUNK_ITEMS
+
+    def generate_raw():
+        yield b'['
+        for start in range(0, len(items), chunk_size):
+            chunk = b','.join(dumps(item) for item in items[start:start + chunk_size])
+            yield chunk if start == 0 else b',' + chunk
+        yield b']'
+
+    def generate_compressed():
+        process, finish = _compressor(encoding)
+        for part in generate_raw():
+            compressed = process(part)
+            if compressed:
+                yield compressed
+        yield finish()
+
+    response = Response(generate_compressed() if encoding else generate_raw(),
+                        status=status, mimetype='application/json')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+
+def snapshot_json_response(body, gzip_body, etag: str) -> Response:
+    """
+    Отдает заранее сериализованный (и сжатый) JSON, например из mmap-снимка каталога.
+    Тело отдается кусками, без копирования всего снимка в память процесса.
+    """
+    if etag in request.if_none_match:
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    encoding = None
+    if len(body) >= config.JSON_COMPRESS_MIN_SIZE and request.accept_encodings.best_match(['gzip']):
+        encoding = 'gzip'
+    payload = gzip_body if encoding else body
+
+    def generate():
+        for start in range(0, len(payload), SNAPSHOT_CHUNK_SIZE):
+            yield bytes(payload[start:start + SNAPSHOT_CHUNK_SIZE])
+
+    response = Response(generate(), mimetype='application/json')
+    response.headers['Content-Length'] = str(len(payload))
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.set_etag(etag)
+    return response
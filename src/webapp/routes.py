@@ -1,10 +1,60 @@
 # src/webapp/routes.py
-from flask import Blueprint, render_template, jsonify
+import math
+from datetime import timedelta
+from flask import Blueprint, render_template, request
+import config
 from database import SessionLocal
 from database import queries
+from .auth import get_webapp_user_id
+from services import catalog_snapshot, popularity, watchdog
+from utils.rate_limit import get_limiter
+from .responses import json_response, stream_json_list, snapshot_json_response
 bp = Blueprint('main', __name__, template_folder='templates', static_folder='static')
 
 
+def serialize_product_details(product, holds: dict[int, int]) -> dict:
+    """
+    Карточка товара для Mini App: только варианты, которые есть в наличии.
+    Остаток уменьшается на активные резервы из корзин (holds).
+    """
+    variants = [
+        {'id': v.id, 'size': v.size, 'price': v.price, 'stock': v.stock - holds.get(v.id, 0)}
+        for v in product.variants if v.stock - holds.get(v.id, 0) > 0
+    ]
+    return {
+        'id': product.id, 'name': product.name, 'brand': product.brand,
+        'description': product.description, 'composition': product.composition,
+        'photo_url': product.photo_url, 'variants': variants
+    }
+
+
+@bp.before_request
+def apply_rate_limit():
+    """
+    Отбрасываем лишние запросы до открытия сессии БД. Лимит считается на покупателя
+    (telegram_id из проверенной initData), а без нее — на IP клиента (с учетом ProxyFix).
+    """
+    endpoint = (request.endpoint or '').rsplit('.', 1)[-1]
+    limiter = get_limiter(f'web:{endpoint}')
+    if limiter is None:
+        return None
+    telegram_id = get_webapp_user_id()
+    key = f"tg:{telegram_id}" if telegram_id is not None else f"ip:{request.remote_addr}"
+    retry_after = limiter.hit(key)
+    if retry_after:
+        response = json_response({'error': 'Too many requests'}, 429)
+        response.headers['Retry-After'] = str(math.ceil(retry_after))
+        return response
+    return None
+
+
+@bp.route('/healthz')
+def healthz():
+    """Готовность: доступность БД и, если боты в этом же процессе (main.py), их состояние."""
+    healthy, report = watchdog.health_report()
+    return json_response(report, 200 if healthy else 503)
+
+
 @bp.route('/')
 def index():
     return render_template('index.html')
@@ -12,10 +62,26 @@ def index():
 
 @bp.route('/api/products')
 def api_get_products():
+    # sort=popular — тот же каталог, заранее упорядоченный по рейтингу популярности
+    sort = request.args.get('sort', '')
+    if sort not in ('', 'popular'):
+        return json_response({'error': 'Invalid sort'}, 400)
+    popular = sort == 'popular'
+
+    # Основной путь: готовый JSON из общего mmap-снимка, без обращения к БД
+    snapshot = (catalog_snapshot.popular_reader if popular else catalog_snapshot.reader).current()
+    if snapshot is not None:
+        etag = f"{snapshot.version}-popular" if popular else str(snapshot.version)
+        return snapshot_json_response(snapshot.body, snapshot.gzip_body, etag)
+
+    # Снимка еще нет (первый запуск) — отвечаем из БД и просим его опубликовать
+    catalog_snapshot.request_publish()
     db = SessionLocal()
     try:
         products = queries.get_active_products_with_variants(db)
-        return jsonify(products)
+        if popular:
+            products = catalog_snapshot.order_by_popularity(products, queries.get_popularity_scores(db))
+        return stream_json_list(products)
     finally:
         db.close()
 
@@ -26,19 +92,77 @@ def api_get_product_details(product_id):
     try:
         product = queries.get_product_details(db, product_id)
         if not product:
-            return jsonify({'error': 'Product not found'}), 404
-
-        # Отдаем только варианты, которые есть в наличии
-        variants = [
-            {'id': v.id, 'size': v.size, 'price': v.price, 'stock': v.stock}
-            for v in product.variants if v.stock > 0
-        ]
-
-        product_details = {
-            'id': product.id, 'name': product.name, 'brand': product.brand,
-            'description': product.description, 'composition': product.composition,
-            'photo_url': product.photo_url, 'variants': variants
-        }
-        return jsonify(product_details)
+            return json_response({'error': 'Product not found'}, 404)
+
+        holds = queries.get_active_holds(db, [v.id for v in product.variants])
+        popularity.record_view(product_id)
+        return json_response(serialize_product_details(product, holds))
+    finally:
+        db.close()
+
+
+@bp.route('/api/product/<int:product_id>/view', methods=['POST'])
+def api_track_product_view(product_id):
+    """Просмотр карточки, открытой из кэша Mini App (без запроса /api/product/<id>)."""
+    popularity.record_view(product_id)
+    return '', 204
+
+
+@bp.route('/api/products/details')
+def api_get_products_details():
+    """Пакетная выдача карточек: /api/products/details?ids=1,2,3"""
+    try:
+        product_ids = list(dict.fromkeys(
+            int(raw_id) for raw_id in request.args.get('ids', '').split(',') if raw_id.strip()))
+    except ValueError:
+        return json_response({'error': 'Invalid ids'}, 400)
+
+    if not product_ids:
+        return json_response({'error': 'No ids'}, 400)
+    if len(product_ids) > config.PRODUCT_DETAILS_BATCH_LIMIT:
+        return json_response({'error': 'Too many ids'}, 400)
+
+    db = SessionLocal()
+    try:
+        products = queries.get_products_details(db, product_ids)
+        holds = queries.get_active_holds(db, [v.id for p in products for v in p.variants])
+        return json_response({str(p.id): serialize_product_details(p, holds) for p in products})
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+@bp.route('/api/reservations', methods=['POST'])
+def api_reserve_variant():
+    """Резервирует вариант за пользователем на время RESERVATION_TTL_MINUTES (quantity=0 снимает резерв)."""
+    telegram_id = get_webapp_user_id()
+    if telegram_id is None:
+        return json_response({'error': 'Unauthorized'}, 401)
+
+    data = request.get_json(silent=True) or {}
+    try:
+        variant_id = int(data['variant_id'])
+        quantity = int(data.get('quantity', 1))
+        # added=true — первое добавление в корзину (а не изменение количества)
+        added = bool(data.get('added', False))
+    except (KeyError, ValueError, TypeError):
+        return json_response({'error': 'Invalid reservation'}, 400)
+    if quantity < 0:
+        return json_response({'error': 'Invalid reservation'}, 400)
+    if quantity > config.RESERVATION_MAX_QUANTITY:
+        # Лимит на покупателя: один аккаунт не может занять весь остаток размера
+        return json_response({'error': 'Quantity limit exceeded',
+                              'max_quantity': config.RESERVATION_MAX_QUANTITY}, 409)
+
+    db = SessionLocal()
+    try:
+        ttl = timedelta(minutes=config.RESERVATION_TTL_MINUTES)
+        expires_at = queries.reserve_variant(db, telegram_id, variant_id, quantity, ttl)
+        if expires_at is None:
+            return json_response({'error': 'Out of stock'}, 409)
+        catalog_snapshot.request_publish()
+        if added and quantity > 0:
+            popularity.record_cart(variant_id)
+        return json_response({'variant_id': variant_id, 'quantity': quantity,
+                              'expires_at': expires_at.isoformat() + 'Z'})
+    finally:
+        db.close()
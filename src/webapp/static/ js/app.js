@@ -1,6 +1,12 @@
 // src/webapp/static/js/app.js
 const tg = window.Telegram.WebApp;
 
+const PREFETCH_BATCH_SIZE = 50;
+// Сколько живет карточка в кэше: остатки и размеры меняются, пока покупатели резервируют
+const PRODUCT_CACHE_TTL_MS = 30000;
+// Токен запуска от бота: при открытии с обычной клавиатуры Telegram не передает initData
+const LAUNCH_TOKEN = new URLSearchParams(window.location.search).get('token') || '';
+
 const app = Vue.createApp({
     data() {
         return {
@@ -15,6 +21,7 @@ const app = Vue.createApp({
                 brand: ''
             },
             searchQuery: '',
+            sort: '', // '' — сначала новые, 'popular' — по популярности
             tg: window.Telegram.WebApp,
         };
     },
@@ -54,8 +61,14 @@ const app = Vue.createApp({
         async fetchProducts() {
             this.isLoading = true;
             try {
-                const response = await fetch('/api/products');
+                const response = await fetch(this.sort ? `/api/products?sort=${this.sort}` : '/api/products');
                 if (!response.ok) throw new Error('Network response was not ok');
+                // Новая версия снимка каталога — остатки изменились, кэш карточек устарел
+                const version = (response.headers.get('ETag') || '').replace(/"|-popular/g, '');
+                if (version !== this.catalogVersion) {
+                    this.productCache.clear();
+                    this.catalogVersion = version;
+                }
                 this.products = await response.json();
             } catch (error) {
                 console.error("Failed to fetch products:", error);
@@ -64,14 +77,62 @@ const app = Vue.createApp({
                 this.isLoading = false;
             }
         },
+        prefetchProduct(productId) {
+            if (this.getCachedProduct(productId) || this.prefetchQueue.has(productId)) return;
+            this.prefetchQueue.add(productId);
+            // Копим id карточек, попавших в экран, и забираем их одним запросом
+            if (!this.prefetchTimer) {
+                this.prefetchTimer = setTimeout(() => this.flushPrefetch(), 150);
+            }
+        },
+        async flushPrefetch() {
+            this.prefetchTimer = null;
+            const ids = Array.from(this.prefetchQueue).slice(0, PREFETCH_BATCH_SIZE);
+            ids.forEach(id => this.prefetchQueue.delete(id));
+            if (this.prefetchQueue.size > 0) {
+                this.prefetchTimer = setTimeout(() => this.flushPrefetch(), 0);
+            }
+            try {
+                const response = await fetch(`/api/products/details?ids=${ids.join(',')}`);
+                if (!response.ok) throw new Error('Network response was not ok');
+                const details = await response.json();
+                Object.values(details).forEach(product => this.cacheProduct(product));
+            } catch (error) {
+                // Предзагрузка — не критична: при открытии товара сделаем обычный запрос
+                console.warn("Failed to prefetch product details:", error);
+            }
+        },
+        getCachedProduct(productId) {
+            const entry = this.productCache.get(productId);
+            if (!entry) return null;
+            if (Date.now() - entry.cachedAt > PRODUCT_CACHE_TTL_MS) {
+                this.productCache.delete(productId);
+                return null;
+            }
+            return entry.product;
+        },
+        cacheProduct(product) {
+            this.productCache.set(product.id, { product, cachedAt: Date.now() });
+        },
         async showProduct(productId) {
-            this.isLoading = true;
             this.currentProduct = null;
             this.selectedVariant = null;
+
+            const cached = this.getCachedProduct(productId);
+            if (cached) {
+                // Карточка из кэша не запрашивается с сервера — просмотр отмечаем отдельно
+                navigator.sendBeacon(`/api/product/${productId}/view`);
+                this.currentProduct = cached;
+                this.showView('product');
+                return;
+            }
+
+            this.isLoading = true;
             try {
                 const response = await fetch(`/api/product/${productId}`);
                 if (!response.ok) throw new Error('Product not found');
                 this.currentProduct = await response.json();
+                this.cacheProduct(this.currentProduct);
                 this.showView('product');
             } catch (error) {
                 console.error("Failed to fetch product details:", error);
@@ -88,7 +149,42 @@ const app = Vue.createApp({
         selectVariant(variant) {
             this.selectedVariant = variant;
         },
-        addToCart() {
+        async reserve(variantId, quantity, added = false) {
+            // Удерживаем товар за покупателем, пока он в корзине (quantity = 0 снимает резерв)
+            try {
+                const response = await fetch('/api/reservations', {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json',
+                        'X-Telegram-Init-Data': this.tg.initData,
+                        'X-Webapp-Launch-Token': LAUNCH_TOKEN
+                    },
+                    body: JSON.stringify({ variant_id: variantId, quantity: quantity, added: added })
+                });
+                const data = response.ok ? null : await response.json().catch(() => ({}));
+                return { ok: response.ok, status: response.status, data };
+            } catch (error) {
+                console.error("Failed to reserve variant:", error);
+                return { ok: false, status: 0, data: null };
+            }
+        },
+        reserveErrorMessage(result, soldOutMessage) {
+            // Отказ в резерве — не всегда «нет в наличии»: различаем причины по статусу ответа
+            if (result.status === 401) {
+                return 'Сессия магазина устарела. Откройте магазин заново через /start.';
+            }
+            if (result.status === 429) {
+                return 'Слишком много запросов. Попробуйте через несколько секунд.';
+            }
+            if (result.status === 409 && result.data && result.data.max_quantity) {
+                return `Можно взять не больше ${result.data.max_quantity} шт. одного размера.`;
+            }
+            if (result.status === 409) {
+                return soldOutMessage;
+            }
+            return 'Не удалось связаться с магазином. Попробуйте еще раз.';
+        },
+        async addToCart() {
             if (!this.selectedVariant) return;
             const existingItem = this.cart.find(item => item.variant_id === this.selectedVariant.id);
 
@@ -101,22 +197,39 @@ const app = Vue.createApp({
                 return;
             }
 
+            const variant = this.selectedVariant;
+            const product = this.currentProduct;
+            const result = await this.reserve(variant.id, 1, true);
+            if (!result.ok) {
+                this.tg.showAlert(this.reserveErrorMessage(result, 'К сожалению, этот размер уже разобрали.'));
+                if (result.status === 409) {
+                    this.productCache.delete(product.id);
+                }
+                return;
+            }
+
             this.cart.push({
-                variant_id: this.selectedVariant.id,
-                product_name: this.currentProduct.name,
-                photo_url: this.currentProduct.photo_url,
-                size: this.selectedVariant.size,
-                price: this.selectedVariant.price,
+                variant_id: variant.id,
+                product_name: product.name,
+                photo_url: product.photo_url,
+                size: variant.size,
+                price: variant.price,
                 quantity: 1
             });
 
             this.saveCart();
             this.tg.HapticFeedback.notificationOccurred('success');
         },
-        updateQuantity(variant_id, delta) {
+        async updateQuantity(variant_id, delta) {
             const item = this.cart.find(i => i.variant_id === variant_id);
             if (item) {
-                item.quantity += delta;
+                const newQuantity = Math.max(item.quantity + delta, 0);
+                const result = await this.reserve(variant_id, newQuantity);
+                if (!result.ok && delta > 0) {
+                    this.tg.showAlert(this.reserveErrorMessage(result, 'Больше этого размера нет в наличии.'));
+                    return;
+                }
+                item.quantity = newQuantity;
                 if (item.quantity <= 0) {
                     this.cart = this.cart.filter(i => i.variant_id !== variant_id);
                 }
@@ -181,6 +294,21 @@ const app = Vue.createApp({
              this.updateMainButton();
         }
     },
+    created() {
+        // Кеш карточек держим вне reactive-данных: Vue не нужно за ним следить
+        this.productCache = new Map(); // id -> { product, cachedAt }
+        this.catalogVersion = null;
+        this.prefetchQueue = new Set();
+        this.prefetchTimer = null;
+        this.prefetchObserver = new IntersectionObserver((entries) => {
+            entries.forEach(entry => {
+                if (entry.isIntersecting) {
+                    this.prefetchProduct(Number(entry.target.dataset.productId));
+                    this.prefetchObserver.unobserve(entry.target);
+                }
+            });
+        }, { rootMargin: '200px' });
+    },
     mounted() {
         this.configureTelegramUi();
         this.loadCart();
@@ -189,4 +317,15 @@ const app = Vue.createApp({
     }
 });
 
+// v-prefetch="product.id": подгружает карточку товара, когда она появляется в области видимости
+app.directive('prefetch', {
+    mounted(el, binding) {
+        el.dataset.productId = binding.value;
+        binding.instance.prefetchObserver.observe(el);
+    },
+    beforeUnmount(el, binding) {
+        binding.instance.prefetchObserver.unobserve(el);
+    }
+});
+
 app.mount('#app');
\ No newline at end of file
@@ -0,0 +1,7 @@
+# tests/test_query_plans.py
+from database.plan_checker import check_query_plans
+
+
+def test_queries_use_indexes():
+    """Каждая функция database.queries покрыта сценарием, и ни один запрос не сканирует таблицу целиком."""
+    assert check_query_plans() == []